@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+
+# Run from anywhere: the pipeline modules live one folder up
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+from invoice_generator import generate_corpus
+from fixture_site import FixtureSite
+from browser_pool import BrowserPool
+from listing import ScrapeScheduler
+
+# === CONFIG ===
+PORTALS = 3  # Local fixture portals scraped together
+INVOICES_PER_PORTAL = 120
+PAGE_SIZE = 10  # Rows per table page, so each portal has 12 pages
+POOL_SIZES = (1, 3)
+PAGES_PER_TASK = 4
+RECYCLE_AFTER_PAGES = 8
+
+def bench(sites, pool_size):
+    expected = {site.base_url: [inv.invoice_id for inv in site.corpus.values()] for site in sites}
+    pool = BrowserPool(pool_size, recycle_after=RECYCLE_AFTER_PAGES)
+    scheduler = ScrapeScheduler(pool, pages_per_task=PAGES_PER_TASK)
+    started = time.perf_counter()
+    try:
+        results = scheduler.scrape(list(expected))
+    finally:
+        scheduler.close()
+    seconds = time.perf_counter() - started
+
+    pages = sum(-(-len(ids) // PAGE_SIZE) for ids in expected.values())
+    wrong = [url for url, records in results.items() if [r.invoice_id for r in records] != expected[url]]
+    starts = sum(session.starts for session in pool.sessions)
+    print(f"⏱️ pool {pool_size}: {seconds:6.2f}s for {pages} pages ({pages / seconds:5.1f} pages/s), "
+          f"{starts} browser starts, {len(wrong)}/{len(sites)} portals wrong {wrong if wrong else ''}")
+
+if __name__ == "__main__":
+    try:
+        import selenium  # noqa: F401
+    except ImportError:
+        sys.exit("⚠️ selenium is not installed; nothing to benchmark")
+
+    sites = [FixtureSite(generate_corpus(INVOICES_PER_PORTAL, seed=i), page_size=PAGE_SIZE).start()
+             for i in range(PORTALS)]
+    try:
+        print(f"🧪 {PORTALS} portals x {INVOICES_PER_PORTAL} invoices, {PAGE_SIZE} rows per page")
+        for pool_size in POOL_SIZES:
+            bench(sites, pool_size)
+    finally:
+        for site in sites:
+            site.stop()
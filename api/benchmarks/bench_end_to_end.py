@@ -0,0 +1,240 @@
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import tempfile
+import subprocess
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, so no peak RSS
+    resource = None
+
+# Run from anywhere: the pipeline modules live one folder up
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+from invoice_generator import generate_corpus, write_corpus, read_corpus
+from fixture_site import FixtureSite
+
+# === CONFIG ===
+CORPUS_SIZES = (10, 50, 200)
+BENCHMARKS = ("listing", "download", "parse", "ocr", "full")
+SITE_LATENCY = 0.02  # Seconds added to every fixture-site response, roughly a nearby server
+LISTING_ROUNDS = 5  # Full listings per corpus size; latency is per listing call
+RESULTS_PATH = "bench_results.jsonl"  # Every result is appended here, for comparing runs over time
+
+# === MEASUREMENT ===
+def percentile(values, q):
+    # Nearest-rank percentile; None for an empty sample
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+def peak_rss_mb(who="self"):
+    # Peak resident set size of this process, or of its largest finished child (the OCR workers)
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in KiB on Linux but bytes on macOS
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def summarize(name, size, items, seconds, latencies, correct=None):
+    return {
+        "benchmark": name,
+        "corpus": size,
+        "items": items,
+        "seconds": round(seconds, 4),
+        "per_second": round(items / seconds, 2) if seconds else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+        "correct": correct,
+    }
+
+def timed_calls(fn, args_list):
+    latencies, results = [], []
+    for args in args_list:
+        started = time.perf_counter()
+        results.append(fn(*args))
+        latencies.append(time.perf_counter() - started)
+    return latencies, results
+
+def ocr_unavailable():
+    # The OCR benchmarks need a working tesseract; report why not instead of timing failures
+    from extract import ocr_engine
+    try:
+        ocr_engine().version()
+    except Exception as e:
+        return str(e)
+    return None
+
+# === BENCHMARKS (each runs in its own process, so peak RSS belongs to that benchmark alone) ===
+def bench_listing(corpus, base_url, workdir):
+    from listing import list_invoices
+
+    def listing():
+        # Fails loudly instead of starting Chrome if the fast sources break
+        return list(list_invoices(base_url, fallback=NoFallback()))
+
+    started = time.perf_counter()
+    latencies, results = timed_calls(listing, [()] * LISTING_ROUNDS)
+    seconds = time.perf_counter() - started
+    correct = sum(len(records) == len(corpus) for records in results)
+    return summarize("listing", len(corpus), len(corpus) * LISTING_ROUNDS, seconds, latencies,
+                     f"{correct}/{LISTING_ROUNDS}")
+
+class NoFallback:
+    name = "none"
+
+    def records(self):
+        raise RuntimeError("fast listing failed against the fixture site")
+
+def bench_download(corpus, base_url, workdir):
+    from downloader import InvoiceDownloader
+
+    class TimedDownloader(InvoiceDownloader):
+        # Per-invoice latency is time spent downloading, not time waiting for a free worker
+        latencies = []
+
+        def download(self, invoice_id, url):
+            started = time.perf_counter()
+            result = super().download(invoice_id, url)
+            self.latencies.append(time.perf_counter() - started)
+            return result
+
+    started = time.perf_counter()
+    with TimedDownloader(os.path.join(workdir, "downloads")) as downloader:
+        for invoice in corpus:
+            downloader.submit(invoice.invoice_id, f"{base_url}invoices/{invoice.invoice_id}.jpg")
+        results = downloader.wait()
+    seconds = time.perf_counter() - started
+    correct = sum(1 for path in results.values() if path)
+    return summarize("download", len(corpus), len(corpus), seconds, TimedDownloader.latencies,
+                     f"{correct}/{len(corpus)}")
+
+def bench_parse(corpus, base_url, workdir):
+    # The rendered text stands in for perfect OCR output, so this is the parser alone
+    from extract import parse_invoice_text
+    started = time.perf_counter()
+    latencies, results = timed_calls(parse_invoice_text, [(invoice.text,) for invoice in corpus])
+    seconds = time.perf_counter() - started
+    correct = sum(result == invoice.expected for result, invoice in zip(results, corpus))
+    return summarize("parse", len(corpus), len(corpus), seconds, latencies, f"{correct}/{len(corpus)}")
+
+def bench_ocr(corpus, base_url, workdir):
+    # One process, no cache: the per-image cost of preprocessing, OCR and parsing
+    import extract
+    reason = ocr_unavailable()
+    if reason:
+        return {"benchmark": "ocr", "corpus": len(corpus), "skipped": reason}
+    extract.USE_OCR_CACHE = False
+    images = os.path.join(workdir, "corpus")
+    started = time.perf_counter()
+    latencies, results = timed_calls(extract.extract_invoice_data,
+                                     [(os.path.join(images, f"{invoice.invoice_id}.jpg"),) for invoice in corpus])
+    seconds = time.perf_counter() - started
+    correct = sum(result == invoice.expected for result, invoice in zip(results, corpus))
+    return summarize("ocr", len(corpus), len(corpus), seconds, latencies, f"{correct}/{len(corpus)}")
+
+def bench_full(corpus, base_url, workdir):
+    # What `cli.py run` (full.py) does, against the fixture site, from an empty run directory; in-process
+    # so the manifest hooks below can time each invoice
+    reason = ocr_unavailable()
+    if reason:
+        return {"benchmark": "full", "corpus": len(corpus), "skipped": reason}
+    from listing import list_invoices
+    from manifest import RunManifest
+    from pipeline import InvoicePipeline
+
+    class TimedManifest(RunManifest):
+        # Per-invoice latency: listed -> row written
+        listed, latencies = {}, []
+
+        def mark_listed(self, invoice_id, due_date, url):
+            self.listed.setdefault(invoice_id, time.perf_counter())
+            super().mark_listed(invoice_id, due_date, url)
+
+        def mark_emitted(self, invoice_ids):
+            super().mark_emitted(invoice_ids)
+            now = time.perf_counter()
+            self.latencies.extend(now - self.listed[i] for i in invoice_ids if i in self.listed)
+
+    run_dir = os.path.join(workdir, "full")
+    os.makedirs(run_dir)
+    os.chdir(run_dir)  # OCR cache and manifest land here, not next to real runs
+    manifest = TimedManifest()
+    started = time.perf_counter()
+    written = InvoicePipeline("invoices", "extracted_invoices.csv", manifest,
+                              records=list_invoices(base_url, fallback=NoFallback())).run()
+    seconds = time.perf_counter() - started
+    manifest.close()
+    return summarize("full", len(corpus), written, seconds, TimedManifest.latencies, f"{written}/{len(corpus)}")
+
+BENCH_FUNCTIONS = {
+    "listing": bench_listing,
+    "download": bench_download,
+    "parse": bench_parse,
+    "ocr": bench_ocr,
+    "full": bench_full,
+}
+
+def run_child(name, base_url, workdir, result_path):
+    corpus = read_corpus(os.path.join(workdir, "corpus"))
+    # Benchmark logging would swamp the report; keep stdout for the driver's table
+    sys.stdout = open(os.devnull, "w")
+    result = BENCH_FUNCTIONS[name](corpus, base_url, workdir)
+    result["peak_rss_mb"] = peak_rss_mb("self")
+    result["workers_peak_rss_mb"] = peak_rss_mb("children")
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+# === DRIVER ===
+def run_benchmark(name, base_url, workdir):
+    result_path = os.path.join(workdir, f"{name}.json")
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name, base_url, workdir, result_path],
+                   check=True)
+    with open(result_path) as f:
+        return json.load(f)
+
+def format_result(result):
+    if "skipped" in result:
+        return f"⚠️ {result['benchmark']:<9} n={result['corpus']:<5} skipped: {result['skipped']}"
+
+    def number(value, fmt):
+        return "-" if value is None else format(value, fmt)
+
+    return (f"⏱️ {result['benchmark']:<9} n={result['corpus']:<5} {number(result['per_second'], '9.1f')}/s"
+            f"   p50 {number(result['p50_ms'], '9.2f')} ms   p95 {number(result['p95_ms'], '9.2f')} ms"
+            f"   peak RSS {number(result['peak_rss_mb'], '6.1f')} MB"
+            f" (workers {number(result['workers_peak_rss_mb'], '6.1f')} MB)   ok {result['correct']}")
+
+def main(sizes, benchmarks, results_path=RESULTS_PATH):
+    stamp = datetime.now().isoformat(timespec="seconds")
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix=f"invoice-bench-{size}-")
+        try:
+            corpus = generate_corpus(size)
+            write_corpus(corpus, os.path.join(workdir, "corpus"))
+            with FixtureSite(corpus, latency=SITE_LATENCY) as site:
+                print(f"\n🧪 {size} synthetic invoices at {site.base_url}")
+                for name in benchmarks:
+                    result = run_benchmark(name, site.base_url, workdir)
+                    print(format_result(result))
+                    with open(results_path, "a") as f:
+                        f.write(json.dumps(dict(result, run=stamp)) + "\n")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    print(f"\n📈 Results appended to {results_path}")
+
+if __name__ == "__main__":
+    # python bench_end_to_end.py [sizes...] [--only=listing,download,...]
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        run_child(*sys.argv[2:6])
+        sys.exit(0)
+    sizes = [int(a) for a in sys.argv[1:] if not a.startswith("--")] or list(CORPUS_SIZES)
+    only = next((a.split("=", 1)[1].split(",") for a in sys.argv[1:] if a.startswith("--only=")), None)
+    main(sizes, [name for name in BENCHMARKS if not only or name in only])
@@ -0,0 +1,107 @@
+import os
+import re
+import sys
+import json
+import time
+from datetime import datetime
+
+# Run from anywhere: the pipeline modules live one folder up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from field_extractor import FieldExtractor, FIELDS, TEMPLATES_PATH
+
+# === CONFIG ===
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+CORPUS_DIR = os.path.join(FIXTURES_DIR, "ocr_text")
+EXPECTED_PATH = os.path.join(FIXTURES_DIR, "expected.json")
+ROUNDS = 2000  # Passes over the whole corpus per parser
+VENDOR_COUNTS = (50, 200)  # Extra synthetic vendor templates, to see how parsing cost grows with vendors
+
+# === BASELINE: the line loop extract_invoice_data used before the template engine ===
+def legacy_parse(extracted_text):
+    invoice_number = invoice_date = company_name = total_due = None
+    for line in extracted_text.split("\n"):
+        line = line.strip()
+        if invoice_number is None and "Invoice #" in line:
+            invoice_number = line.split("Invoice #")[-1].strip()
+        elif invoice_number is None and line.startswith("#"):
+            invoice_number = line.strip().lstrip("#").strip()
+        if "Date:" in line:
+            invoice_date = line.split(":", 1)[-1].strip()
+        elif invoice_date is None and any(char.isdigit() for char in line) and "-" in line:
+            match = re.search(r"\d{4}-\d{2}-\d{2}", line)
+            if match:
+                try:
+                    invoice_date = datetime.strptime(match.group(), "%Y-%m-%d").strftime("%b %d, %Y")
+                except ValueError:
+                    pass
+        if (company_name is None or total_due is None) and ("Corp." in line or "LLC" in line) and "$" in line:
+            match = re.search(r"(.*?)(\$[\d,]+\.\d{2})", line)
+            if match:
+                company_name = match.group(1).strip()
+                total_due = match.group(2).strip()
+        if company_name is None and ("Corp." in line or "LLC" in line):
+            company_name = line.strip()
+            if company_name and "INVOICE" in company_name:
+                company_name = company_name.replace("INVOICE", "").strip()
+        if total_due is None:
+            match = re.search(r"Total\s+([\d,]+\.\d{2})", line)
+            if match:
+                total_due = f"${match.group(1)}"
+    if company_name:
+        company_name = company_name.replace("'", "").replace("’", "").replace('"', "").strip()
+    if invoice_number and invoice_date and company_name and total_due:
+        return invoice_number, invoice_date, company_name, total_due
+    return None
+
+def synthetic_vendor_templates(count):
+    # Vendors that never occur in the corpus: they should cost a substring test each, nothing more
+    return [{
+        "name": f"vendor_{i:03d}",
+        "match": f"Vendor{i:03d}\\s+Ltd",
+        "fields": {"company_name": {"value": f"Vendor{i:03d} Ltd", "confidence": 0.99}},
+        "rules": [
+            {"pattern": f"Ref V{i:03d}-(?P<invoice_number>\\d+)", "confidence": 0.97},
+            {"pattern": f"^[ \\t]*Amount due V{i:03d}[ \\t]+(?P<total_due>[\\d,]+\\.\\d{{2}})", "confidence": 0.97, "prefix": "$"},
+        ],
+    } for i in range(count)]
+
+def template_parser(extra_vendors=0):
+    with open(TEMPLATES_PATH, encoding="utf-8") as f:
+        templates = json.load(f)
+    extractor = FieldExtractor(synthetic_vendor_templates(extra_vendors) + templates)
+
+    def parse(text):
+        fields = extractor.extract(text)
+        if all(field in fields for field in FIELDS):
+            return tuple(fields[field].value for field in FIELDS)
+        return None
+    return parse
+
+def load_corpus():
+    with open(EXPECTED_PATH, encoding="utf-8") as f:
+        expected = json.load(f)
+    corpus = {}
+    for filename in sorted(expected):
+        with open(os.path.join(CORPUS_DIR, filename), encoding="utf-8") as f:
+            corpus[filename] = f.read()
+    return corpus, expected
+
+def bench(name, parse, corpus, expected):
+    texts = list(corpus.values())
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for text in texts:
+            parse(text)
+    per_doc = (time.perf_counter() - started) / (ROUNDS * len(texts))
+
+    wrong = [filename for filename, text in corpus.items()
+             if parse(text) != (tuple(expected[filename]) if expected[filename] else None)]
+    print(f"⏱️ {name:<12} {per_doc * 1e6:7.1f} µs/doc   {len(wrong)}/{len(corpus)} wrong {wrong if wrong else ''}")
+
+if __name__ == "__main__":
+    corpus, expected = load_corpus()
+    print(f"🧪 {len(corpus)} OCR text fixtures x {ROUNDS} rounds")
+    bench("legacy", legacy_parse, corpus, expected)
+    bench("templates", template_parser(), corpus, expected)
+    for count in VENDOR_COUNTS:
+        bench(f"+{count} vendors", template_parser(count), corpus, expected)
@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import statistics
+from PIL import Image, ImageDraw
+
+# Run from anywhere: the pipeline modules live one folder up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ocr_backends import BACKENDS
+
+# === CONFIG ===
+IMAGE_DIR = "invoices"  # Falls back to synthetic pages when this folder has no images
+SAMPLE_SIZE = 20
+
+def synthetic_pages(count):
+    pages = []
+    for i in range(count):
+        page = Image.new("L", (850, 1100), 255)
+        draw = ImageDraw.Draw(page)
+        draw.text((60, 60), "Sit Amet Corp.", fill=0)
+        draw.text((560, 60), f"Invoice #{10000 + i}", fill=0)
+        draw.text((560, 90), "Date: Jun 15, 2019", fill=0)
+        draw.text((560, 900), f"Total {1000 + i}.40", fill=0)
+        pages.append(page)
+    return pages
+
+def load_pages(folder, count):
+    if os.path.isdir(folder):
+        files = sorted(f for f in os.listdir(folder) if f.lower().endswith(('.jpg', '.jpeg', '.png')))[:count]
+        if files:
+            pages = []
+            for filename in files:
+                with Image.open(os.path.join(folder, filename)) as image:
+                    image.load()
+                    pages.append(image)
+            return pages
+    return synthetic_pages(count)
+
+def bench_backend(backend_cls, pages):
+    # Setup plus the first image is what every call pays when the engine is not kept alive
+    started = time.perf_counter()
+    engine = backend_cls()
+    engine.image_to_string(pages[0])
+    cold = time.perf_counter() - started
+
+    latencies = []
+    for page in pages[1:]:
+        started = time.perf_counter()
+        engine.image_to_string(page)
+        latencies.append(time.perf_counter() - started)
+    engine.close()
+    return cold, latencies
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else IMAGE_DIR
+    pages = load_pages(folder, SAMPLE_SIZE)
+    print(f"🧪 {len(pages)} pages per backend")
+    for name, backend_cls in BACKENDS.items():
+        try:
+            cold, latencies = bench_backend(backend_cls, pages)
+        except Exception as e:
+            print(f"⚠️ {name}: unavailable ({e})")
+            continue
+        p50 = statistics.median(latencies) if latencies else cold
+        p95 = statistics.quantiles(latencies, n=20)[18] if len(latencies) >= 2 else p50
+        print(f"⏱️ {name:<12} first {cold * 1000:7.1f} ms   p50 {p50 * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms per image")
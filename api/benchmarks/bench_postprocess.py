@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, date, timedelta
+
+# Run from anywhere: the pipeline modules live one folder up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from postprocess import RowValidator
+
+# === CONFIG ===
+BATCH_SIZES = (1, 50, 500, 2000, 10000, 100000)  # 1 and 50: streaming trickles; the rest: whole runs and backlogs
+MIN_SECONDS = 0.5  # Repeat each batch size at least this long
+BAD_ROW_SHARE = 0.02  # Rows with a broken date or amount, so the rejects path is paid for too
+
+# === BASELINE: the per-row formatting output rows went through before the validation stage ===
+def legacy_rows(records):
+    today_date = datetime.today().date()
+    rows = []
+    for invoice_id, due_date, (invoice_number, invoice_date, company_name, total_due), duplicate_of in records:
+        try:
+            invoice_date_obj = datetime.strptime(invoice_date, "%b %d, %Y")
+        except ValueError:
+            continue
+        if invoice_date_obj.date() > today_date:
+            continue
+        rows.append([invoice_id, due_date, invoice_number, invoice_date_obj.strftime("%d-%m-%Y"), company_name,
+                     total_due.replace("$", "").strip(), duplicate_of or ""])
+    return rows
+
+def synthetic_records(count, seed=7):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        invoice_date = (date(2019, 1, 1) + timedelta(days=rng.randrange(1500))).strftime("%b %d, %Y")
+        total_due = f"${rng.uniform(10, 50000):,.2f}"
+        if rng.random() < BAD_ROW_SHARE:
+            invoice_date, total_due = "Jan 3l, 2O19", "$1,2O4.00"  # Typical OCR letter-for-digit swaps
+        records.append((f"inv{i:06d}", None, (f"{100000 + i}", invoice_date, "Sit Amet Corp.", total_due), None))
+    return records
+
+def bench(name, fn, records):
+    runs, started = 0, time.perf_counter()
+    while time.perf_counter() - started < MIN_SECONDS:
+        fn(records)
+        runs += 1
+    per_batch = (time.perf_counter() - started) / runs
+    return f"{name} {per_batch * 1e3:9.3f} ms ({per_batch / len(records) * 1e6:6.2f} µs/row)"
+
+if __name__ == "__main__":
+    rejects_csv = os.path.join(tempfile.mkdtemp(), "bench_rejects.csv")
+
+    def validator(vectorize_min_rows):
+        # A fresh validator per batch, so invoice numbers claimed by the previous repeat do not count
+        return lambda records: RowValidator(rejects_csv, vectorize_min_rows=vectorize_min_rows).process(records)
+
+    import logging
+    logging.disable(logging.WARNING)
+    for size in BATCH_SIZES:
+        records = synthetic_records(size)
+        results = [bench("legacy", legacy_rows, records),
+                   bench("rows", validator(float("inf")), records),
+                   bench("pandas", validator(0), records)]
+        print(f"⏱️ {size:>6} rows: " + "   ".join(results))
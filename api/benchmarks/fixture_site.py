@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import time
+import threading
+from html import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from invoice_generator import generate_corpus
+
+# === CONFIG ===
+HOST = "127.0.0.1"
+LATENCY = 0.0  # Extra seconds per request, to stand in for the real site's round trip
+
+# Client-side pager for page_size mode: swaps in a new <tbody> per page, like DataTables redraws
+PAGER_JS = """
+var rows = %(rows)s, pageSize = %(page_size)d, pages = Math.ceil(rows.length / pageSize), current = 1;
+function show(page) {
+    if (page < 1 || page > pages || page === current) { return; }
+    current = page;
+    var body = document.createElement('tbody');
+    rows.slice((page - 1) * pageSize, page * pageSize).forEach(function (row, i) {
+        var tr = document.createElement('tr');
+        tr.innerHTML = '<td>' + ((page - 1) * pageSize + i + 1) + '</td><td>' + row[0] + '</td><td>' + row[1] +
+            '</td><td><a href="' + row[2] + '">Download</a></td>';
+        body.appendChild(tr);
+    });
+    var table = document.getElementById('tableSandbox');
+    table.replaceChild(body, table.tBodies[0]);
+}
+document.getElementById('tableSandbox_paginate').addEventListener('click', function (event) {
+    var target = event.target;
+    if (target.id === 'tableSandbox_next') { show(current + 1); }
+    else if (target.id === 'tableSandbox_previous') { show(current - 1); }
+    else if (/^\\d+$/.test(target.textContent)) { show(parseInt(target.textContent, 10)); }
+});
+"""
+
+class FixtureSite:
+    """Local stand-in for rpachallengeocr: the invoice table (HTML and the JSON "seed" endpoint) and its images."""
+
+    def __init__(self, corpus, host=HOST, port=0, latency=LATENCY, page_size=None):
+        self.corpus = {invoice.invoice_id: invoice for invoice in corpus}
+        self.latency = latency
+        self.page_size = page_size  # Paginate the HTML table in the browser (for the Selenium listing)
+        self.requests = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fixture-site", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    # === PAGES ===
+    def table_html(self):
+        # Same table id and column order (#, ID, Due Date, Invoice) as the real page
+        invoices = list(self.corpus.values())
+        shown = invoices[:self.page_size] if self.page_size else invoices
+        rows = "".join(
+            f"<tr><td>{i}</td><td>{escape(inv.invoice_id)}</td><td>{inv.due_date}</td>"
+            f'<td><a href="/invoices/{escape(inv.invoice_id)}.jpg">Download</a></td></tr>'
+            for i, inv in enumerate(shown, 1)
+        )
+        html = ('<html><body><table id="tableSandbox"><thead><tr><th>#</th><th>ID</th><th>Due Date</th>'
+                f"<th>Invoice</th></tr></thead><tbody>{rows}</tbody></table>")
+        if self.page_size:
+            pages = max(1, -(-len(invoices) // self.page_size))
+            buttons = "".join(f'<a class="paginate_button">{page}</a> ' for page in range(1, pages + 1))
+            data = json.dumps([[inv.invoice_id, inv.due_date, f"/invoices/{inv.invoice_id}.jpg"] for inv in invoices])
+            html += ('<div id="tableSandbox_paginate"><a class="paginate_button previous" id="tableSandbox_previous">'
+                     f'Previous</a> {buttons}<a class="paginate_button next" id="tableSandbox_next">Next</a></div>'
+                     f"<script>{PAGER_JS % {'rows': data, 'page_size': self.page_size}}</script>")
+        return html + "</body></html>"
+
+    def seed_json(self):
+        return json.dumps({"data": [
+            {"#": i, "ID": inv.invoice_id, "Due Date": inv.due_date, "Invoice": f"/invoices/{inv.invoice_id}.jpg"}
+            for i, inv in enumerate(self.corpus.values(), 1)
+        ]})
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real site, so pooled connections matter
+
+            def do_GET(self):
+                if self.path == "/":
+                    return self._send(200, "text/html", site.table_html().encode())
+                if self.path.startswith("/invoices/"):
+                    invoice = site.corpus.get(os.path.splitext(os.path.basename(self.path))[0])
+                    if invoice:
+                        return self._send(200, "image/jpeg", invoice.image)
+                self._send(404, "text/plain", b"not found")
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path.rstrip("/") == "/seed":
+                    return self._send(200, "application/json", site.seed_json().encode())
+                self._send(404, "text/plain", b"not found")
+
+            def _send(self, status, content_type, body):
+                site.requests += 1
+                if site.latency:
+                    time.sleep(site.latency)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+if __name__ == "__main__":
+    # python fixture_site.py [count] [port]: serve a synthetic corpus until Ctrl+C
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+    with FixtureSite(generate_corpus(count), port=port) as site:
+        print(f"🌐 Serving {count} synthetic invoices at {site.base_url}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
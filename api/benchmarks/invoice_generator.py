@@ -0,0 +1,108 @@
+import io
+import os
+import sys
+import json
+import random
+from collections import namedtuple
+from datetime import date, timedelta
+from PIL import Image, ImageDraw, ImageFont
+
+# === CONFIG ===
+FONT_SIZE = 28
+IMAGE_FORMAT = "JPEG"  # What the challenge site serves
+JPEG_QUALITY = 90
+
+# Page sizes match the aspect ratios of the layouts in preprocess.py, so the ROI crops apply
+PAGE_SIZES = {"portrait": (850, 1100), "landscape": (1100, 780)}
+
+# One synthetic invoice: what the site lists, what gets rendered, and what extraction should return
+SyntheticInvoice = namedtuple("SyntheticInvoice", ["invoice_id", "due_date", "layout", "text", "expected", "image"])
+
+def _font(size=FONT_SIZE):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only has the small bitmap font
+        return ImageFont.load_default()
+
+def _sit_amet(rng, invoice_date):
+    # Portrait page: vendor, number and date in the header, "Total" near the bottom
+    number = str(rng.randint(10000, 99999))
+    total = f"{rng.randint(100, 20000):,}.{rng.randint(0, 99):02d}"
+    header = ["Sit Amet Corp. INVOICE", "123 Main Street", "", f"Invoice # {number}",
+              f"Date: {invoice_date:%b %d, %Y}"]
+    totals = ["Description    Qty    Price", f"Services       1      {total}", "", f"Total {total}"]
+    return "portrait", header, totals, (number, f"{invoice_date:%b %d, %Y}", "Sit Amet Corp.", f"${total}")
+
+def _aenean(rng, invoice_date):
+    # Landscape page: "#number" and an ISO date up top, vendor and amount on one line below
+    number = str(rng.randint(100000, 999999))
+    total = f"{rng.randint(100, 20000):,}.{rng.randint(0, 99):02d}"
+    header = ["INVOICE", "", f"#{number}", f"{invoice_date:%Y-%m-%d}", "", "BILL TO", "ACME Industries"]
+    totals = [f"Aenean LLC ${total}", "", "Thank you for your business"]
+    return "landscape", header, totals, (number, f"{invoice_date:%b %d, %Y}", "Aenean LLC", f"${total}")
+
+VENDORS = [_sit_amet, _aenean]
+
+def render(layout, header, totals, font=None):
+    # Header lines go in the top band and totals in the lower band that preprocess.LAYOUTS crops
+    font = font or _font()
+    width, height = PAGE_SIZES[layout]
+    page = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(page)
+    line_height = round(FONT_SIZE * 1.4)
+    for lines, top in ((header, round(height * 0.05)), (totals, round(height * 0.6))):
+        for i, line in enumerate(lines):
+            draw.text((round(width * 0.07), top + i * line_height), line, fill="black", font=font)
+    return page
+
+def generate_invoice(index, rng, font=None):
+    invoice_date = date(2019, 1, 1) + timedelta(days=rng.randint(0, 364))
+    due_date = invoice_date + timedelta(days=rng.choice((15, 30, 45)))
+    layout, header, totals, expected = VENDORS[index % len(VENDORS)](rng, invoice_date)
+
+    buffer = io.BytesIO()
+    render(layout, header, totals, font).save(buffer, IMAGE_FORMAT, quality=JPEG_QUALITY)
+    return SyntheticInvoice(
+        invoice_id=f"bench{index:05d}",
+        due_date=f"{due_date:%d-%m-%Y}",
+        layout=layout,
+        text="\n".join(header + [""] + totals),
+        expected=expected,
+        image=buffer.getvalue(),
+    )
+
+def generate_corpus(count, seed=0):
+    """Return `count` invoices; the same seed always gives the same corpus."""
+    rng = random.Random(seed)
+    font = _font()
+    return [generate_invoice(i, rng, font) for i in range(count)]
+
+def write_corpus(corpus, folder):
+    # <id>.jpg per invoice, plus corpus.json with the listing data and expected fields
+    os.makedirs(folder, exist_ok=True)
+    for invoice in corpus:
+        with open(os.path.join(folder, f"{invoice.invoice_id}.jpg"), "wb") as f:
+            f.write(invoice.image)
+    with open(os.path.join(folder, "corpus.json"), "w", encoding="utf-8") as f:
+        json.dump([{"invoice_id": i.invoice_id, "due_date": i.due_date, "layout": i.layout,
+                    "text": i.text, "expected": i.expected} for i in corpus], f, indent=1)
+
+def read_corpus(folder):
+    # The inverse of write_corpus: SyntheticInvoices with the images read back from disk
+    with open(os.path.join(folder, "corpus.json"), encoding="utf-8") as f:
+        entries = json.load(f)
+    corpus = []
+    for entry in entries:
+        with open(os.path.join(folder, f"{entry['invoice_id']}.jpg"), "rb") as f:
+            image = f.read()
+        corpus.append(SyntheticInvoice(entry["invoice_id"], entry["due_date"], entry["layout"],
+                                       entry["text"], tuple(entry["expected"]), image))
+    return corpus
+
+if __name__ == "__main__":
+    # python invoice_generator.py [count] [folder]
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    folder = sys.argv[2] if len(sys.argv) > 2 else "synthetic_invoices"
+    write_corpus(generate_corpus(count), folder)
+    print(f"🧾 Wrote {count} synthetic invoices to {folder}")
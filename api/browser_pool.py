@@ -0,0 +1,122 @@
+import os
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+
+# === CONFIG ===
+POOL_SIZE = 4  # Headless Chrome sessions kept open at once
+RECYCLE_AFTER_PAGES = 50  # Restart a session after this many pages; Chrome's memory only grows
+CHROMEDRIVER_PATH = None  # Set to a chromedriver binary to skip webdriver_manager entirely
+DRIVER_PATH_CACHE = ".chromedriver_path"  # Remembers the path webdriver_manager resolved, across runs
+
+log = logging.getLogger(__name__)
+
+# === DRIVER BINARY ===
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def driver_path():
+    # ChromeDriverManager().install() queries the latest driver version over the network on every
+    # call; resolve the binary once and reuse it for every session and every later run
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path and os.path.isfile(_driver_path):
+            return _driver_path
+        if CHROMEDRIVER_PATH:
+            _driver_path = CHROMEDRIVER_PATH
+            return _driver_path
+        if os.path.isfile(DRIVER_PATH_CACHE):
+            with open(DRIVER_PATH_CACHE) as f:
+                cached = f.read().strip()
+            if os.path.isfile(cached):
+                _driver_path = cached
+                return _driver_path
+
+        from webdriver_manager.chrome import ChromeDriverManager
+        _driver_path = ChromeDriverManager().install()
+        with open(DRIVER_PATH_CACHE, "w") as f:
+            f.write(_driver_path)
+        log.info(f"🧰 chromedriver resolved to {_driver_path}")
+        return _driver_path
+
+def chrome_driver():
+    # Imported here so runs that never open a browser never load Selenium
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    return webdriver.Chrome(service=Service(driver_path()), options=options)
+
+# === SESSIONS ===
+class BrowserSession:
+    """One reusable browser; the driver is started on first use and again after each recycle."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._driver = None
+        self.pages = 0  # Pages served by the current driver
+        self.starts = 0
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = self.factory()
+            self.pages = 0
+            self.starts += 1
+        return self._driver
+
+    def page_done(self, count=1):
+        self.pages += count
+
+    def quit(self):
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception as e:
+                log.warning(f"⚠️ Browser did not quit cleanly: {e}")
+            self._driver = None
+
+class BrowserPool:
+    """A fixed number of browser sessions shared by scraping threads.
+
+    session() hands out an idle session (blocking while all are busy) and takes it back afterwards.
+    Sessions past recycle_after pages, or that raised, are quit and restart on their next use.
+    `factory` builds a driver; chrome_driver by default, anything WebDriver-like for tests.
+    """
+
+    def __init__(self, size=POOL_SIZE, recycle_after=RECYCLE_AFTER_PAGES, factory=chrome_driver):
+        self.size = size
+        self.recycle_after = recycle_after
+        self.sessions = [BrowserSession(factory) for _ in range(size)]
+        self.idle = queue.Queue()
+        for session in self.sessions:
+            self.idle.put(session)
+
+    @contextmanager
+    def session(self):
+        session = self.idle.get()
+        try:
+            yield session
+        except Exception:
+            # A driver left in an unknown state is not worth reusing
+            session.quit()
+            raise
+        finally:
+            if session.pages >= self.recycle_after:
+                log.info(f"♻️ Recycling browser session after {session.pages} pages")
+                session.quit()
+            self.idle.put(session)
+
+    def close(self):
+        for session in self.sessions:
+            session.quit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
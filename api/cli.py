@@ -0,0 +1,161 @@
+import os
+import sys
+import logging
+import argparse
+from datetime import datetime
+
+# Only the standard library is imported up here: each subcommand imports what it uses, so an
+# extract-only run never loads requests or Selenium, and a fully cached one never loads PIL either
+
+# === CONFIG ===
+DOWNLOAD_DIR = "invoices"  # Folder where downloaded invoices are saved
+OUTPUT_CSV = "extracted_invoices.csv"  # Output CSV file name (Parquet/SQLite outputs sit next to it)
+
+log = logging.getLogger("cli")
+
+def _records(args):
+    from listing import list_invoices, BASE_URL
+    portals = args.base_url or [BASE_URL]
+    if not args.selenium:
+        for portal in portals:
+            yield from list_invoices(portal)
+        return
+
+    # --selenium skips the JSON/HTML sources and walks every portal's table over a pool of Chrome sessions;
+    # each page range is handed on as soon as it is read, so downloads start before the walk ends
+    from listing import ScrapeScheduler
+    from browser_pool import BrowserPool
+    scheduler = ScrapeScheduler(BrowserPool(args.sessions))
+    try:
+        for _, _, records in scheduler.iter_scrape(portals):
+            yield from records
+    finally:
+        scheduler.close()
+
+def _is_due(record):
+    due_date = datetime.strptime(record.due_date, "%d-%m-%Y")
+    if due_date > datetime.today():
+        log.debug(f"⏩ Skipping {record.invoice_id} - due {record.due_date} (future)")
+        return False
+    return True
+
+# === SUBCOMMANDS ===
+def scrape(args):
+    """List the invoice table into the run manifest."""
+    from manifest import RunManifest
+    manifest = RunManifest(args.manifest)
+    count = 0
+    for record in _records(args):
+        manifest.mark_listed(record.invoice_id, record.due_date, record.url)
+        count += 1
+    log.info(f"📋 Listed {count} invoices; manifest: {manifest.counts()}")
+    manifest.close()
+
+def download(args):
+    """List and download every invoice that is due and not already on disk."""
+    from downloader import InvoiceDownloader
+    from manifest import RunManifest
+    from metrics import get_metrics
+    manifest = RunManifest(args.manifest)
+    os.makedirs(args.download_dir, exist_ok=True)
+
+    # Downloads overlap with the listing over one pooled HTTP session
+    with InvoiceDownloader(args.download_dir) as downloader:
+        try:
+            for record in _records(args):
+                try:
+                    manifest.mark_listed(record.invoice_id, record.due_date, record.url)
+                    if _is_due(record) and not manifest.is_downloaded(record.invoice_id):
+                        downloader.submit(record.invoice_id, record.url)
+                except Exception as e:
+                    log.error(f"❌ Error processing {record.invoice_id}: {str(e)}")
+                    get_metrics().failure("list", type(e).__name__, record.invoice_id)
+        finally:
+            for invoice_id, file_path in downloader.wait().items():
+                if file_path:
+                    manifest.mark_downloaded(invoice_id, file_path)
+
+    log.info(f"🎉 Download done! Manifest: {manifest.counts()}")
+    manifest.close()
+
+def extract(args):
+    """OCR every image in the download folder and rewrite the outputs."""
+    from extract import process_invoices
+    from manifest import RunManifest
+    # Real due dates from an earlier scrape/download instead of the placeholder; what is written here is
+    # recorded as emitted, so a later `run` only appends invoices it has not seen
+    manifest = RunManifest(args.manifest)
+    process_invoices(args.download_dir, args.output, args.formats, manifest.due_dates(), manifest)
+    log.info(f"📒 Manifest: {manifest.counts()}")
+    manifest.close()
+
+def run(args):
+    """Stream listing, downloads, OCR and output all at once, resuming from the manifest."""
+    from manifest import RunManifest
+    # OCR workers import the extractor by module name, so the stages live outside this script
+    from pipeline import InvoicePipeline
+    os.makedirs(args.download_dir, exist_ok=True)
+
+    # Per-invoice progress (due date, download checksum, OCR fields, emitted) survives crashes and reruns
+    manifest = RunManifest(args.manifest)
+    log.info("🚀 Starting invoice workflow...")
+    log.info(f"📒 Manifest: {manifest.counts()}")
+
+    InvoicePipeline(args.download_dir, args.output, manifest, records=_records(args), output_formats=args.formats).run()
+    log.info(f"📒 Manifest: {manifest.counts()}")
+    manifest.close()
+
+def watch(args):
+    """Keep running: OCR every invoice dropped into the download folder within seconds and append its row."""
+    from manifest import RunManifest
+    from daemon import InvoiceDaemon, STATUS_PORT
+    os.makedirs(args.download_dir, exist_ok=True)
+
+    manifest = RunManifest(args.manifest)
+    daemon = InvoiceDaemon(args.download_dir, args.output, manifest, output_formats=args.formats,
+                           port=args.port or STATUS_PORT)
+    daemon.run()
+    log.info(f"📒 Manifest: {manifest.counts()}")
+    manifest.close()
+
+COMMANDS = {"scrape": scrape, "download": download, "extract": extract, "run": run, "watch": watch}
+
+# === ENTRY POINT ===
+def build_parser():
+    from manifest import MANIFEST_PATH
+    from sinks import OUTPUT_FORMATS
+    from browser_pool import POOL_SIZE
+
+    parser = argparse.ArgumentParser(prog="cli.py", description="RPA challenge invoice scraper and OCR extractor")
+    parser.add_argument("--log-level", default=None, help="DEBUG, INFO, WARNING... (default: metrics.LOG_LEVEL)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, fn in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=fn.__doc__, description=fn.__doc__)
+        sub.add_argument("--download-dir", default=DOWNLOAD_DIR)
+        sub.add_argument("--manifest", default=MANIFEST_PATH)
+        if name in ("scrape", "download", "run"):
+            sub.add_argument("--base-url", action="append", default=None,
+                             help="Invoice site, repeatable for several portals (default: listing.BASE_URL)")
+            sub.add_argument("--selenium", action="store_true", help="Skip the fast listing and use Chrome")
+            sub.add_argument("--sessions", type=int, default=POOL_SIZE, help="Chrome sessions for --selenium")
+        if name in ("extract", "run", "watch"):
+            sub.add_argument("--output", default=OUTPUT_CSV)
+            sub.add_argument("--formats", default=",".join(OUTPUT_FORMATS),
+                             type=lambda value: tuple(f for f in value.split(",") if f),
+                             help="Comma-separated: csv, parquet, sqlite")
+        if name == "watch":
+            sub.add_argument("--port", type=int, default=None, help="Local status endpoint (default: daemon.STATUS_PORT)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from metrics import get_metrics, setup_logging, LOG_LEVEL
+    setup_logging(args.log_level or LOG_LEVEL)
+    try:
+        COMMANDS[args.command](args)
+    finally:
+        # Span timings and failure counts: run_report.jsonl (appended) and invoice_pipeline.prom
+        get_metrics().finish()
+
+if __name__ == "__main__":
+    sys.exit(main())
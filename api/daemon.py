@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import signal
+import logging
+import threading
+from urllib.parse import urlparse, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pipeline import InvoicePipeline, _DONE
+from metrics import get_metrics
+from image_io import IMAGE_EXTENSIONS
+from sinks import OUTPUT_FORMATS
+from manifest import OCRD, EMITTED
+
+# === CONFIG ===
+USE_INOTIFY = True  # Linux: get told about new files (needs inotify_simple); otherwise the folder is polled
+POLL_SECONDS = 1.0  # How often the folder is rescanned (polling) or the stop flag checked (inotify)
+SETTLE_SECONDS = 1.0  # Polling: a file counts as written once its size and mtime hold still this long
+STATUS_HOST = "127.0.0.1"  # Status endpoint only listens locally
+STATUS_PORT = 8765
+
+log = logging.getLogger(__name__)
+
+# === WATCHING ===
+class FolderWatcher:
+    """Reports invoice images that appear in (or are rewritten into) a folder, once completely written.
+
+    With inotify a file is reported when its writer closes it or it is moved in, which covers the
+    downloader's write-to-temp-then-rename. Without it, the folder is rescanned every POLL_SECONDS.
+    Files already there when the watcher starts are left to the caller.
+    """
+
+    def __init__(self, directory, extensions=IMAGE_EXTENSIONS, poll_seconds=POLL_SECONDS,
+                 settle_seconds=SETTLE_SECONDS, use_inotify=USE_INOTIFY):
+        self.directory = directory
+        self.extensions = extensions
+        self.poll_seconds = poll_seconds
+        self.settle_seconds = settle_seconds
+        self.inotify = self._open_inotify() if use_inotify else None
+        self.mode = "inotify" if self.inotify else "polling"
+        self.known = self._scan()  # Path -> (size, mtime) of files already reported (or there at start)
+        self.changing = {}  # Path -> ((size, mtime), when first seen that way), polling only
+
+    def _open_inotify(self):
+        try:
+            from inotify_simple import INotify, flags
+        except ImportError:
+            log.info("👀 inotify_simple not installed (pip install inotify_simple); polling the folder instead")
+            return None
+        try:
+            inotify = INotify()
+            inotify.add_watch(self.directory, flags.CLOSE_WRITE | flags.MOVED_TO)
+        except OSError as e:
+            log.warning(f"⚠️ inotify unavailable ({e}); polling the folder instead")
+            return None
+        return inotify
+
+    def _wanted(self, filename):
+        # Hidden files are the downloader's (and most tools') half-written temporaries
+        return not filename.startswith(".") and filename.lower().endswith(self.extensions)
+
+    def _scan(self):
+        files = {}
+        for entry in os.scandir(self.directory):
+            if self._wanted(entry.name) and entry.is_file():
+                stat = entry.stat()
+                files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def changes(self, stop):
+        """Yield paths of finished files until `stop` (a threading.Event) is set."""
+        while not stop.is_set():
+            if self.inotify:
+                paths = self._read_events()
+            else:
+                stop.wait(self.poll_seconds)
+                paths = self._poll()
+            yield from paths
+
+    def _read_events(self):
+        events = self.inotify.read(timeout=int(self.poll_seconds * 1000))
+        return sorted({os.path.join(self.directory, event.name) for event in events if self._wanted(event.name)})
+
+    def _poll(self):
+        now = time.monotonic()
+        current = self._scan()
+        ready = []
+        for path, stat in current.items():
+            if self.known.get(path) == stat:
+                continue
+            seen = self.changing.get(path)
+            if seen is None or seen[0] != stat:
+                # New, or still being written: wait for it to hold still
+                self.changing[path] = (stat, now)
+            elif now - seen[1] >= self.settle_seconds:
+                ready.append(path)
+                self.known[path] = stat
+                del self.changing[path]
+        for path in set(self.known) - set(current):
+            del self.known[path]
+        return sorted(ready)
+
+    def close(self):
+        if self.inotify:
+            self.inotify.close()
+
+# === STATUS ENDPOINT ===
+class StatusHandler(BaseHTTPRequestHandler):
+    # GET /status: queue depths and counts; GET /status/<invoice_id>: where that invoice is
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/status":
+            self._reply(200, self.server.pipeline.status())
+        elif path.startswith("/status/"):
+            status = self.server.pipeline.invoice_status(unquote(path[len("/status/"):]))
+            self._reply(200 if status else 404, status or {"error": "unknown invoice"})
+        else:
+            self._reply(404, {"error": "try /status or /status/<invoice_id>"})
+
+    def _reply(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        log.debug(f"🌐 {self.address_string()} {format % args}")
+
+# === DAEMON ===
+class InvoiceDaemon(InvoicePipeline):
+    """Runs until stopped, streaming every invoice dropped into a folder through OCR to the outputs.
+
+    The pipeline's OCR and output stages are reused as they are; a watch stage takes the place of
+    listing and downloading. OCR workers start (and load their engine) once, up front, and rows are
+    appended within FLUSH_SECONDS of their OCR finishing.
+    """
+
+    def __init__(self, watch_dir, output_csv, manifest, output_formats=OUTPUT_FORMATS, host=STATUS_HOST,
+                 port=STATUS_PORT, watcher=None, **kwargs):
+        # The watch stage is the OCR stage's only producer
+        super().__init__(watch_dir, output_csv, manifest, download_workers=1, output_formats=output_formats,
+                         warm_workers=True, **kwargs)
+        self.watcher = watcher or FolderWatcher(watch_dir)
+        self.stopping = threading.Event()
+        self.started_at = time.time()
+        self.pid = os.getpid()
+        self.server = ThreadingHTTPServer((host, port), StatusHandler)
+        self.server.daemon_threads = True
+        self.server.pipeline = self
+
+    def stop(self, *_):
+        # Forked OCR workers inherit this handler, so a Ctrl-C or SIGTERM to the whole process group leaves
+        # them running while this process drains them
+        if os.getpid() != self.pid:
+            return
+        if not self.stopping.is_set():
+            log.info("🛑 Stopping: finishing the invoices already picked up")
+            self.stopping.set()
+
+    def run(self):
+        started = time.perf_counter()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.stop)
+            signal.signal(signal.SIGTERM, self.stop)
+        threads = [threading.Thread(target=self._watch_stage, name="watch", daemon=True),
+                   threading.Thread(target=self._ocr_stage, name="ocr", daemon=True),
+                   threading.Thread(target=self.server.serve_forever, name="status", daemon=True)]
+        for thread in threads:
+            thread.start()
+        host, port = self.server.server_address[:2]
+        log.info(f"👀 Watching {self.download_dir} ({self.watcher.mode}); status on http://{host}:{port}/status")
+
+        # Returns once the watch stage has stopped and everything it picked up is written
+        written = self._write_stage(started)
+        self.server.shutdown()
+        self._join(threads)
+        self.server.server_close()
+        self.watcher.close()
+        self.downloader.close()
+        if self.dedup:
+            self.dedup.close()
+        log.info(f"🏁 Stopped. {written} rows appended to {self.output_csv} in {time.perf_counter() - started:.1f}s")
+        return written
+
+    # === STAGE 1: WATCH ===
+    def _watch_stage(self):
+        metrics = get_metrics()
+        try:
+            # Files dropped while the daemon was down, and any a previous run left unfinished
+            self.manifest.adopt_files(self.download_dir, IMAGE_EXTENSIONS)
+            for invoice_id, path in self.manifest.pending_ocr():
+                if os.path.isfile(path):
+                    self._put(self.ocr_q, (invoice_id, path, self._find_original(invoice_id, path)))
+
+            for path in self.watcher.changes(self.stopping):
+                invoice_id = os.path.splitext(os.path.basename(path))[0]
+                try:
+                    # False when these exact bytes were already processed (e.g. touched, or copied in again)
+                    if not self.manifest.mark_downloaded(invoice_id, path):
+                        metrics.count("skipped", stage="watch", reason="already_processed")
+                        continue
+                    log.info(f"📥 New invoice {invoice_id}")
+                    metrics.count("watched")
+                    self._put(self.ocr_q, (invoice_id, path, self._find_original(invoice_id, path)))
+                except Exception as e:
+                    # e.g. removed again before it could be read
+                    log.error(f"❌ Error picking up {path}: {str(e)}")
+                    metrics.failure("watch", type(e).__name__, invoice_id)
+        except Exception as e:
+            log.error(f"❌ Error: {str(e)}")
+            get_metrics().failure("watch", type(e).__name__)
+        finally:
+            self._put(self.ocr_q, _DONE)
+
+    # === STAGE 2: OCR ===
+    def _ocr_stage(self):
+        super()._ocr_stage()
+        if self.aborted.is_set():
+            # Nothing would read the files still to come
+            self.stop()
+
+    # === STATUS ===
+    def status(self):
+        return {
+            "watching": self.download_dir,
+            "mode": self.watcher.mode,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "stopping": self.stopping.is_set(),
+            "queues": {
+                "ocr": self.ocr_q.qsize(),
+                "in_ocr": len(self.inflight),
+                "waiting_for_original": sum(len(waiting) for waiting in list(self.copies.values())),
+                "output": self.row_q.qsize(),
+            },
+            "rejected": self.validator.rejected if self.validator else 0,
+            "invoices": self.manifest.counts(),
+        }
+
+    def invoice_status(self, invoice_id):
+        status = self.manifest.status(invoice_id)
+        if status is None:
+            return None
+        queued = self.is_queued(invoice_id)
+        reasons = self.validator.reasons.get(invoice_id) if self.validator else None
+        if queued:
+            stage = "queued"
+        elif any(item[0] == invoice_id for item in list(self.inflight.values())):
+            stage = "ocr"
+        elif any(item[0] == invoice_id for waiting in list(self.copies.values()) for item in waiting):
+            stage = "waiting_for_original"
+        elif reasons:
+            stage = "rejected"
+        else:
+            stage = {OCRD: "writing", EMITTED: "written"}.get(status["state"], status["state"])
+        return dict(status, stage=stage, reasons=reasons)
@@ -0,0 +1,137 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from manifest import file_checksum
+from image_io import first_page
+
+# === CONFIG ===
+DEDUP_PATH = "dedup_index.sqlite"  # Hashes of every invoice image seen, across runs
+USE_DEDUP = True  # Link re-issued scans to the earlier invoice instead of OCRing and paying them twice
+HASH_SIZE = 16  # dHash grid: HASH_SIZE x HASH_SIZE bits; 8x8 barely tells a mostly white page from another
+PHASH_DISTANCE = 12  # Most differing bits for two images to still count as the same scan
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    invoice_id TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    phash TEXT,
+    fields TEXT,
+    fields_key TEXT,
+    duplicate_of TEXT,
+    kind TEXT,
+    first_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_images_sha256 ON images (sha256);
+CREATE INDEX IF NOT EXISTS idx_images_fields_key ON images (fields_key);
+"""
+
+# === HASHES ===
+def perceptual_hash(path, size=HASH_SIZE):
+    # dHash: shrink to (size + 1) x size grey pixels and keep whether each pixel is brighter than its
+    # right-hand neighbour. Survives re-encoding, rescaling and small shifts; returned as hex
+    from PIL import Image
+    # First page only, decoded small (JPEGs straight at 1/8 scale), which is most of the cost saved
+    with first_page(path, mode="L", max_side=size * 16, target_dpi=None) as image:
+        pixels = image.resize((size + 1, size), Image.BOX).tobytes()
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            bits = bits << 1 | (left > pixels[row * (size + 1) + col + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+def fields_key(fields):
+    return "|".join(str(value).strip().lower() for value in fields)
+
+# === INDEX ===
+class DuplicateIndex:
+    """Exact (SHA-256) and perceptual (dHash) hashes of every invoice image, with its extracted fields.
+
+    add() runs on download: an image with the same bytes as an earlier invoice is an exact copy, and
+    takes that invoice's fields without OCR. record_fields() runs after OCR: a different file that reads
+    the same (invoice number, date, vendor, total) and looks the same is a near copy (a re-issued scan).
+    A whole-page hash alone cannot tell two invoices from the same template apart, so it only ever
+    confirms a match on the fields, never makes one.
+    """
+
+    def __init__(self, path=DEDUP_PATH, max_distance=PHASH_DISTANCE):
+        self.max_distance = max_distance
+        # Download threads add images concurrently, so share one connection behind a lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def add(self, invoice_id, path):
+        """Hash a downloaded image; returns the invoice it is an exact copy of, or None."""
+        sha256 = file_checksum(path)
+        rows = self._execute("SELECT sha256, duplicate_of, kind FROM images WHERE invoice_id = ?", (invoice_id,))
+        if rows and rows[0][0] == sha256:
+            # Seen before (a rerun): keep the link it already has
+            return rows[0][1] if rows[0][2] == "exact" else None
+
+        try:
+            phash = perceptual_hash(path)
+        except Exception as e:
+            log.warning(f"⚠️ No perceptual hash for {invoice_id}: {e}")
+            phash = None
+        original = self._execute(
+            """SELECT invoice_id FROM images WHERE sha256 = ? AND invoice_id != ? AND duplicate_of IS NULL
+               ORDER BY first_seen LIMIT 1""",
+            (sha256, invoice_id),
+        )
+        duplicate_of = original[0][0] if original else None
+        self._execute(
+            """INSERT INTO images (invoice_id, sha256, phash, duplicate_of, kind, first_seen) VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (invoice_id) DO UPDATE SET sha256 = excluded.sha256, phash = excluded.phash,
+               fields = NULL, fields_key = NULL, duplicate_of = excluded.duplicate_of, kind = excluded.kind""",
+            (invoice_id, sha256, phash, duplicate_of, "exact" if duplicate_of else None, time.time()),
+        )
+        if duplicate_of:
+            log.info(f"👯 {invoice_id} is an exact copy of {duplicate_of}")
+        return duplicate_of
+
+    def fields(self, invoice_id):
+        rows = self._execute("SELECT fields FROM images WHERE invoice_id = ?", (invoice_id,))
+        return tuple(json.loads(rows[0][0])) if rows and rows[0][0] else None
+
+    def record_fields(self, invoice_id, fields):
+        """Store what OCR read; returns the invoice this one duplicates (exact or near), or None."""
+        key = fields_key(fields) if fields else None
+        self._execute("UPDATE images SET fields = ?, fields_key = ? WHERE invoice_id = ?",
+                      (json.dumps(list(fields)) if fields else None, key, invoice_id))
+        rows = self._execute("SELECT phash, duplicate_of FROM images WHERE invoice_id = ?", (invoice_id,))
+        if not rows or rows[0][1] or not key or not rows[0][0]:
+            return rows[0][1] if rows else None
+
+        phash = rows[0][0]
+        candidates = self._execute(
+            """SELECT invoice_id, phash FROM images WHERE fields_key = ? AND invoice_id != ? AND duplicate_of IS NULL
+               AND phash IS NOT NULL ORDER BY first_seen""",
+            (key, invoice_id),
+        )
+        for original, other_hash in candidates:
+            if len(other_hash) == len(phash) and hamming(phash, other_hash) <= self.max_distance:
+                self._execute("UPDATE images SET duplicate_of = ?, kind = 'near' WHERE invoice_id = ?",
+                              (original, invoice_id))
+                log.info(f"👯 {invoice_id} is a re-issued scan of {original}")
+                return original
+        return None
+
+    def counts(self):
+        counts = dict(self._execute("SELECT COALESCE(kind, 'original'), COUNT(*) FROM images GROUP BY kind"))
+        return {kind: counts.get(kind, 0) for kind in ("original", "exact", "near")}
+
+    def close(self):
+        self.conn.close()
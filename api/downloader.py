@@ -0,0 +1,151 @@
+import os
+import time
+import logging
+import tempfile
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from metrics import get_metrics, NEW_FILE_MODE
+
+# === CONFIG ===
+MAX_CONCURRENT_DOWNLOADS = 8  # Parallel downloads (and pooled keep-alive connections)
+MAX_RETRIES = 3  # Extra attempts after a 5xx, timeout or dropped connection
+BACKOFF_SECONDS = 0.5  # First retry delay, doubled on each further attempt
+REQUEST_TIMEOUT = (5, 30)  # (connect, read) seconds
+MAX_DOWNLOAD_BYTES = 200 * 1024 * 1024  # Anything bigger is not an invoice scan; stop reading it
+CHUNK_BYTES = 64 * 1024  # Streamed to disk in pieces this size, never held whole in memory
+
+# Errors worth another attempt; anything else (404, bad URL...) fails straight away
+RETRYABLE_ERRORS = (
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+log = logging.getLogger(__name__)
+
+class ServerError(Exception):
+    pass
+
+class TooLarge(Exception):
+    pass
+
+def extension_for(content_type):
+    # Determine file extension from content type
+    if 'image/png' in content_type:
+        return 'png'
+    if 'image/tiff' in content_type:
+        return 'tif'
+    if 'application/pdf' in content_type:
+        return 'pdf'
+    return 'jpg'  # Default extension, also used for image/jpeg
+
+# === DOWNLOADER ===
+class InvoiceDownloader:
+    """Downloads (invoice_id, url) jobs in the background over one pooled HTTP session."""
+
+    def __init__(self, download_dir, max_workers=MAX_CONCURRENT_DOWNLOADS, retries=MAX_RETRIES,
+                 backoff=BACKOFF_SECONDS, timeout=REQUEST_TIMEOUT):
+        self.download_dir = download_dir
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        os.makedirs(download_dir, exist_ok=True)
+
+        # One session reuses TCP/TLS connections instead of a handshake per image
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download")
+        self.jobs = []
+
+    def submit(self, invoice_id, url):
+        # Returns immediately so the scraper can keep walking pages
+        future = self.executor.submit(self.download, invoice_id, url)
+        self.jobs.append((invoice_id, future))
+        return future
+
+    def wait(self):
+        # Block until every queued download has finished; returns invoice_id -> file path (None on failure)
+        results = {invoice_id: future.result() for invoice_id, future in self.jobs}
+        self.jobs = []
+        return results
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def download(self, invoice_id, url):
+        # Blocking download with retries; returns the saved file path or None
+        with get_metrics().span(invoice_id, "download") as span:
+            for attempt in range(self.retries + 1):
+                span["attempts"] = attempt + 1
+                try:
+                    file_path, failure = self._fetch(invoice_id, url)
+                except (ServerError, *RETRYABLE_ERRORS) as e:
+                    if attempt == self.retries:
+                        log.error(f"❌ Failed to download image for {invoice_id} after {attempt + 1} attempts: {e}")
+                        file_path, failure = None, "retries_exhausted"
+                    else:
+                        delay = self.backoff * (2 ** attempt)
+                        log.warning(f"🔁 Retrying {invoice_id} in {delay:.1f}s ({e})")
+                        time.sleep(delay)
+                        continue
+                except TooLarge as e:
+                    log.error(f"❌ Not downloading {invoice_id}: {e}")
+                    file_path, failure = None, "too_large"
+                except Exception as e:
+                    log.error(f"❌ Error downloading {invoice_id}: {e}")
+                    file_path, failure = None, type(e).__name__
+
+                if file_path:
+                    span["bytes"] = os.path.getsize(file_path)
+                else:
+                    span["status"] = "failed"
+                    get_metrics().failure("download", failure, invoice_id)
+                return file_path
+
+    def _fetch(self, invoice_id, url):
+        # Returns (file path, None), or (None, failure reason) for a non-retryable HTTP status
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            if response.status_code >= 500:
+                raise ServerError(f"HTTP status {response.status_code}")
+            if response.status_code != 200:
+                log.error(f"❌ Failed to download image for {invoice_id}: HTTP status {response.status_code}")
+                return None, f"http_{response.status_code}"
+            if int(response.headers.get("content-length") or 0) > MAX_DOWNLOAD_BYTES:
+                raise TooLarge(f"{response.headers['content-length']} bytes")
+
+            ext = extension_for(response.headers.get('content-type', ''))
+            file_path = os.path.join(self.download_dir, f"{invoice_id}.{ext}")
+            self._write_atomic(response, file_path)
+
+        log.debug(f"✅ Downloaded {invoice_id}.{ext}")
+        return file_path, None
+
+    def _write_atomic(self, response, file_path):
+        # Stream into a temp file next to the target, then rename, so readers never see half an image. The
+        # file then gets the mode open() would have given it, not mkstemp's owner-only 0600
+        fd, tmp_path = tempfile.mkstemp(dir=self.download_dir, prefix=".", suffix=".part")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                written = 0
+                for chunk in response.iter_content(chunk_size=CHUNK_BYTES):
+                    written += len(chunk)
+                    if written > MAX_DOWNLOAD_BYTES:
+                        # No Content-Length, or a wrong one
+                        raise TooLarge(f"more than {MAX_DOWNLOAD_BYTES} bytes")
+                    f.write(chunk)
+            os.chmod(tmp_path, NEW_FILE_MODE)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
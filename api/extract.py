@@ -1,139 +1,288 @@
 import os
-import csv
-import pytesseract
-from PIL import Image
-from datetime import datetime
-import re
+import time
+import itertools
+import logging
+from ocr_pool import iter_extract
+from ocr_cache import get_cache, file_cache_key
+from preprocess import preprocess, config_key, PREPROCESS
+from ocr_backends import get_backend, engine_version, OCR_BACKEND
+from field_extractor import extract_fields, templates_key, FIELDS
+from metrics import get_metrics, setup_logging
+from sinks import BatchWriter, open_sinks, OUTPUT_FORMATS
+from postprocess import RowValidator, rejects_path
+from dedup import DuplicateIndex, USE_DEDUP
+from image_io import open_pages, peak_rss_mb, IMAGE_EXTENSIONS
+from tiered_ocr import OcrLayout, region, read_fields, weak_spots, merge_fields, reread, USE_TIERS
+from tiered_ocr import config_key as tiers_key
 
 # === CONFIG ===
 INPUT_DIR = "invoices"  # Folder where downloaded invoices are saved
 OUTPUT_CSV = "extracted_invoices.csv"  # Output CSV file name
+TESSERACT_CONFIG = ""  # Extra tesseract flags; part of the OCR cache key
+USE_OCR_CACHE = True  # Skip OCR for images already seen with the same engine and config
+USE_PREPROCESSING = True  # Grayscale/binarize/rescale and crop to field regions before OCR (see preprocess.py)
+
+log = logging.getLogger(__name__)
+
+def ocr_engine():
+    # Long-lived per worker process (tesserocr when installed, pytesseract otherwise)
+    return get_backend(OCR_BACKEND, TESSERACT_CONFIG)
+
+def tesseract_version():
+    return engine_version(OCR_BACKEND)
+
+def ocr_config():
+    # Everything that changes what tesseract reads or the fields parsed from it; part of the OCR cache key
+    if USE_PREPROCESSING:
+        return f"{TESSERACT_CONFIG}|{config_key()}|{tiers_key()}|{templates_key()}"
+    return f"{TESSERACT_CONFIG}|{tiers_key()}|{templates_key()}"
+
+def _open_pages(image_path, config):
+    if USE_PREPROCESSING:
+        return open_pages(image_path, mode="L" if config["grayscale"] else None,
+                          max_side=config["max_side"], target_dpi=config["target_dpi"])
+    return open_pages(image_path)
+
+def read_pages(image_path, timed, config=PREPROCESS, stage_timings=None):
+    # OCR a file page by page; returns (OcrLayout of every page, whether any page was cropped to field regions).
+    # Pages are decoded at OCR resolution and closed before the next one, so a 20-page TIFF costs one page.
+    # Seconds per preprocessing stage (scale, grayscale...) are summed over the pages into stage_timings
+    engine = ocr_engine()
+    pages = _open_pages(image_path, config)
+    regions, cropped = [], False
+    try:
+        for number in itertools.count():
+            page = timed("decode", next, pages, None)
+            if page is None:
+                break
+            if USE_PREPROCESSING:
+                images, stages = timed("preprocess", preprocess, page, config)
+                if stage_timings is not None:
+                    for stage, seconds in stages.items():
+                        stage_timings[stage] = stage_timings.get(stage, 0.0) + seconds
+            else:
+                images = [page]
+            cropped = cropped or len(images) > 1
+            for index, image in enumerate(images):
+                regions.append(region(number, index, timed("ocr", engine.image_to_data, image)))
+                if image is not page:
+                    image.close()
+    finally:
+        pages.close()
+    return OcrLayout(regions), cropped
+
+def page_images(image_path, config=PREPROCESS):
+    # For the second tier: decode and preprocess the pages it asks for again, exactly as the first read did
+    def wanted_pages(wanted):
+        pages = _open_pages(image_path, config)
+        try:
+            for number, page in enumerate(pages):
+                if number > max(wanted, default=-1):
+                    break
+                if number in wanted:
+                    images = preprocess(page, config)[0] if USE_PREPROCESSING else [page]
+                    yield number, images
+                    for image in images:
+                        if image is not page:
+                            image.close()
+        finally:
+            pages.close()
+    return wanted_pages
+
+def read_invoice(image_path, timed, config=PREPROCESS, stage_timings=None):
+    """OCR a file with the fast settings, then re-read only the lines (or regions) behind doubtful or missing fields.
+
+    Returns ({field: FieldRead}, the final text, whether pages were cropped to field regions).
+    """
+    layout, cropped = read_pages(image_path, timed, config, stage_timings)
+    fields = timed("parse", read_fields, layout)
+    lines, missing = weak_spots(fields)
+    if USE_TIERS and (lines or missing):
+        layout = timed("reocr", reread, layout, ocr_engine(), page_images(image_path, config), lines, missing)
+        fields = merge_fields(fields, timed("parse", read_fields, layout))
+    return fields, layout.text, cropped
+
+# === FUNCTION TO PARSE THE OCR TEXT ===
+def parse_invoice_text(extracted_text):
+    # Field rules live in templates/invoice_templates.json; see field_extractor.py
+    fields = extract_fields(extracted_text)
+    if all(field in fields for field in FIELDS):
+        return tuple(fields[field].value for field in FIELDS)
+    return None
 
 # === FUNCTION TO EXTRACT INVOICE DATA ===
-def extract_invoice_data(image_path):
-    invoice_number = None
-    invoice_date = None
-    company_name = None
-    total_due = None
+def extract_invoice_timed(image_path):
+    """Return (fields or None, timings); timings holds seconds per step (and per preprocessing stage), the cache
+    outcome and any failure reason.
+
+    OCR runs in worker processes, so the timings travel back with the result and the parent records the spans.
+    """
+    timings = {"started": time.time()}
+
+    def timed(step, fn, *args):
+        clock = time.perf_counter()
+        result = fn(*args)
+        timings[step] = timings.get(step, 0.0) + time.perf_counter() - clock
+        return result
 
     try:
-        # Perform OCR on the image
-        image = Image.open(image_path)
-        extracted_text = pytesseract.image_to_string(image)
-
-        # Split the extracted text into lines for easier processing
-        lines = extracted_text.split("\n")
-
-        # Process each line to extract relevant details
-        for line in lines:
-            line = line.strip()
-
-            # Extract invoice number
-            if invoice_number is None and "Invoice #" in line:
-                invoice_number = line.split("Invoice #")[-1].strip()
-            elif invoice_number is None and line.startswith("#"):
-                invoice_number = line.strip().lstrip("#").strip()
-
-            # Extract date (assumes format "Date: Month Day, Year")
-            if "Date:" in line:
-                invoice_date = line.split(":", 1)[-1].strip()
-            elif invoice_date is None and any(char.isdigit() for char in line) and "-" in line:
-                match = re.search(r"\d{4}-\d{2}-\d{2}", line)
-                if match:
-                    try:
-                        parsed = datetime.strptime(match.group(), "%Y-%m-%d")
-                        invoice_date = parsed.strftime("%b %d, %Y")
-                    except ValueError:
-                        pass
-
-            # Extract company name and total if in same line
-            if (company_name is None or total_due is None) and ("Corp." in line or "LLC" in line) and "$" in line:
-                match = re.search(r"(.*?)(\$[\d,]+\.\d{2})", line)
-                if match:
-                    company_name = match.group(1).strip()
-                    total_due = match.group(2).strip()
-
-            # Fallback: Extract company name if not yet found
-            if company_name is None and ("Corp." in line or "LLC" in line):
-                company_name = line.strip()
-                if company_name and "INVOICE" in company_name:
-                    company_name = company_name.replace("INVOICE", "").strip()
-
-            # Fallback: Extract total if line starts with "Total"
-            if total_due is None:
-                match = re.search(r"Total\s+([\d,]+\.\d{2})", line)
-                if match:
-                    total_due = f"${match.group(1)}"
-
-        # Clean quotes
-        if company_name:
-            company_name = company_name.replace("'", "").replace("'", "").replace('"', "").strip()
-
-        if invoice_number and invoice_date and company_name and total_due:
-            return invoice_number, invoice_date, company_name, total_due
+        # Reuse an earlier result for the exact same image bytes
+        cache = get_cache() if USE_OCR_CACHE else None
+        key = file_cache_key(image_path, tesseract_version(), ocr_config()) if cache else None
+        cached = cache.get(key) if cache else None
+        timings["cache"] = ("hit" if cached else "miss") if cache else "off"
+
+        if cached:
+            # Exactly what the miss returned: fields merged across tiers (and the full-page fallback) come from
+            # no single text, so parsing the stored text again could disagree. The key covers the templates
+            fields = cached[1]
         else:
-            print(f"Warning: Missing data for image: {image_path}")
-            return None
+            # Perform OCR on the image, after shrinking and cleaning it up (PIL is only loaded on a cache miss)
+            stage_timings = timings["preprocess_stages"] = {}
+            reads, extracted_text, cropped = read_invoice(image_path, timed, stage_timings=stage_timings)
+
+            if len(reads) < len(FIELDS) and cropped:
+                # The layout crop missed a field; fall back to the whole (preprocessed) pages
+                timings["fallback"] = "full_page"
+                full_reads, extracted_text, _ = read_invoice(image_path, timed, dict(PREPROCESS, roi=False),
+                                                             stage_timings)
+                reads = merge_fields(reads, full_reads)
+            fields = tuple(reads[field].value for field in FIELDS) if len(reads) == len(FIELDS) else None
+            # Which tier produced each field, e.g. {"invoice_number": "fast", "total_due": "quality"}
+            timings["tiers"] = {field: read.tier for field, read in reads.items()}
+            if cache:
+                cache.put(key, extracted_text, fields)
+
+        timings["rss_mb"] = peak_rss_mb()
+        if fields:
+            return fields, timings
+        log.warning(f"Missing data for image: {image_path}")
+        timings["reason"] = "missing_fields"
+        return None, timings
 
     except Exception as e:
-        print(f"Error processing image {image_path}: {e}")
+        log.error(f"Error processing image {image_path}: {e}")
+        timings["reason"] = type(e).__name__
+        return None, timings
+
+def extract_invoice_data(image_path):
+    return extract_invoice_timed(image_path)[0]
+
+# === RECORDING WORKER TIMINGS ===
+OCR_STEPS = ("decode", "preprocess", "ocr", "reocr", "parse")
+
+def record_extraction(invoice_id, result):
+    # result is what extract_invoice_timed returned, or None when the worker itself failed
+    metrics = get_metrics()
+    if result is None:
+        metrics.failure("ocr", "worker_failed", invoice_id)
         return None
+    fields, timings = result
+    status = "ok" if fields else "failed"
+    started = timings.get("started")
+    for step in OCR_STEPS:
+        if step in timings:
+            # The parse span also says which OCR tier each field came from
+            extra = {"tiers": timings["tiers"]} if step == "parse" and "tiers" in timings else {}
+            metrics.record(invoice_id, step, timings[step], status, started,
+                           cache=timings.get("cache"), rss_mb=timings.get("rss_mb"), **extra)
+            if step == "preprocess":
+                # One span per preprocessing stage, laid end to end inside the preprocess span
+                stage_started = started
+                for stage, seconds in timings.get("preprocess_stages", {}).items():
+                    metrics.record(invoice_id, f"preprocess.{stage}", seconds, status, stage_started)
+                    stage_started += seconds
+            started += timings[step]
+    for tier in timings.get("tiers", {}).values():
+        metrics.count("fields", tier=tier)
+    if not fields:
+        metrics.failure("ocr", timings.get("reason", "unknown"), invoice_id)
+    return fields
+
+# === PARALLEL EXTRACTION WITH CACHE REPORT ===
+def iter_extracted(image_paths):
+    # Yields (image path, fields or None) in input order, as soon as each chunk of OCR work finishes
+    before = get_cache().stats() if USE_OCR_CACHE else None
+    image_paths = list(image_paths)
+    # iter_extract goes first so zip runs it to its end, where it logs the OCR rate
+    for result, path in zip(iter_extract(image_paths, extract_invoice_timed), image_paths):
+        yield path, record_extraction(os.path.splitext(os.path.basename(path))[0], result)
+    if before:
+        after = get_cache().stats()
+        hits = after["hits"] - before["hits"]
+        misses = after["misses"] - before["misses"]
+        log.info(f"💾 OCR cache: {hits} hits, {misses} misses ({after['entries']} entries, {after['evictions'] - before['evictions']} evicted)")
 
 # === PROCESSING THE IMAGES ===
-def process_invoices():
-    invoices_data = []
-    today_date = datetime.today().date()
+def process_invoices(input_dir=INPUT_DIR, output_csv=OUTPUT_CSV, output_formats=OUTPUT_FORMATS, due_dates=None,
+                     manifest=None):
+    # due_dates: invoice_id -> due date from the listing (e.g. the run manifest), when known.
+    # manifest: a RunManifest to record each invoice's OCR result and emitted row in, so a later
+    # `run` does not append them a second time
 
     # Get all files in the invoices directory
-    invoice_files = [f for f in os.listdir(INPUT_DIR) if os.path.isfile(os.path.join(INPUT_DIR, f)) 
-                    and f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-    
-    for image_filename in invoice_files:
-        # Get the invoice ID from the filename (remove extension)
-        invoice_id = os.path.splitext(image_filename)[0]
-        image_path = os.path.join(INPUT_DIR, image_filename)
-        
-        print(f"🔢 Extracting data from {image_filename}...")
-        extracted_data = extract_invoice_data(image_path)
-
-        if extracted_data:
-            invoice_number, invoice_date, company_name, total_due = extracted_data
-
-            try:
-                # Convert invoice date to DD-MM-YYYY format
-                invoice_date_obj = datetime.strptime(invoice_date, "%b %d, %Y")
-                formatted_invoice_date = invoice_date_obj.strftime("%d-%m-%Y")
-                
-                # Calculate due date (assuming it's in the past so we can't extract it)
-                # This is just a placeholder - in a real scenario you would extract this data
-                due_date = "25-02-2019"  # Placeholder
-                
-                # Format total due without '$' and with proper decimal
-                total_amount = total_due.replace("$", "").strip()
-                
-                if invoice_date_obj.date() <= today_date:
-                    invoices_data.append([
-                        invoice_id,
-                        due_date,
-                        invoice_number,
-                        formatted_invoice_date,
-                        company_name,
-                        total_amount
-                    ])
-                else:
-                    print(f"❌ Skipping {image_filename} - Due date is in the future.")
-
-            except Exception as e:
-                print(f"❌ Failed to process date for {image_filename}: {e}")
-        else:
-            print(f"❌ Failed to extract data from {image_filename}")
+    invoice_files = sorted(f for f in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, f))
+                    and f.lower().endswith(IMAGE_EXTENSIONS))
+
+    # OCR every image across all cores; results come back in file order
+    log.info(f"🔢 Extracting data from {len(invoice_files)} invoices...")
+    image_paths = [os.path.join(input_dir, f) for f in invoice_files]
+
+    # Exact copies of an earlier image (this run or a previous one) take its fields instead of being OCR'd
+    index = DuplicateIndex() if USE_DEDUP else None
+    copies, seen = {}, set()
+    for image_path in image_paths:
+        invoice_id = os.path.splitext(os.path.basename(image_path))[0]
+        if manifest:
+            manifest.mark_downloaded(invoice_id, image_path)
+        original = index.add(invoice_id, image_path) if index else None
+        # The original is either earlier in this folder (OCR'd below first) or was read on an earlier run
+        if original and (original in seen or index.fields(original)):
+            copies[image_path] = original
+        seen.add(invoice_id)
+    extracted = iter_extracted([path for path in image_paths if path not in copies])
+
+    # The CSV is rewritten from scratch, the whole run checked and normalized as one batch (a column at a
+    # time once it is large enough; see postprocess.VECTORIZE_MIN_ROWS). With a manifest, OCR results are
+    # recorded as they come, so a crash before the write loses no OCR work. The due date is not printed on
+    # the invoice; without the listing's value it falls back to a placeholder
+    results = {}
+    validator = RowValidator(rejects_path(output_csv), due_dates, default_due_date="25-02-2019")
+    on_flush = (lambda rows: manifest.mark_emitted([row[0] for row in rows])) if manifest else None
+    with BatchWriter(open_sinks(output_csv, output_formats, append=False), batch_size=len(image_paths),
+                     prepare=validator, on_flush=on_flush) as writer:
+        for image_path in image_paths:
+            image_filename = os.path.basename(image_path)
+            # Get the invoice ID from the filename (remove extension)
+            invoice_id = os.path.splitext(image_filename)[0]
+            duplicate_of = copies.get(image_path)
+            if duplicate_of:
+                extracted_data = results[duplicate_of] if duplicate_of in results else index.fields(duplicate_of)
+                index.record_fields(invoice_id, extracted_data)
+                get_metrics().count("duplicates", kind="exact")
+            else:
+                extracted_data = next(extracted)[1]
+                results[invoice_id] = extracted_data
+                duplicate_of = index.record_fields(invoice_id, extracted_data) if index else None
+                if duplicate_of:
+                    get_metrics().count("duplicates", kind="near")
 
-    with open(OUTPUT_CSV, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["ID", "DueDate", "InvoiceNo", "InvoiceDate", "CompanyName", "TotalDue"])
-        writer.writerows(invoices_data)
+            if manifest:
+                manifest.mark_ocrd(invoice_id, extracted_data, duplicate_of)
+            if extracted_data:
+                writer.add((invoice_id, None, extracted_data, duplicate_of))
+            else:
+                log.error(f"❌ Failed to extract data from {image_filename}")
+    next(extracted, None)  # Runs the generator to its end, which logs the OCR rate and cache report
 
-    print(f"\n🏁 Done. Extracted data saved in {OUTPUT_CSV}")
+    if index:
+        log.info(f"👯 Duplicate index: {index.counts()}")
+        index.close()
+    if validator.rejected:
+        log.warning(f"🚫 {validator.rejected} rows rejected, with reasons, in {validator.rejects_csv}")
+    log.info(f"🏁 Done. Extracted data saved in {output_csv}")
 
 if __name__ == "__main__":
-    process_invoices()
\ No newline at end of file
+    setup_logging()
+    process_invoices()
+    get_metrics().finish()
\ No newline at end of file
@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import hashlib
+from functools import lru_cache
+from collections import namedtuple
+from datetime import datetime
+
+# === CONFIG ===
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "invoice_templates.json")
+FIELDS = ("invoice_number", "invoice_date", "company_name", "total_due")
+OUTPUT_DATE_FORMAT = "%b %d, %Y"  # What the rest of the pipeline expects for invoice_date
+
+# One extracted value, with how sure we are, which template/rule produced it and where in the text it was
+# read (None for values a template pins outright)
+FieldMatch = namedtuple("FieldMatch", ["value", "confidence", "template", "rule", "span"], defaults=(None,))
+
+# A run of plain characters in a pattern: not escaped, not optional. Patterns with groups, classes or
+# alternation get no hint, as any part of them may be optional (or case-insensitive)
+PLAIN_RUN = re.compile(r"(?<![\\\w ])[\w ]+(?![?*{])")
+SPECIAL = re.compile(r"[|()\[]")
+
+def literal_hint(pattern):
+    # Text every match of the pattern contains; a cheap substring test before the regex
+    if SPECIAL.search(pattern):
+        return None
+    best = max(PLAIN_RUN.findall(pattern), key=len, default="")
+    return best if len(best) >= 3 else None
+
+@lru_cache(maxsize=4096)
+def reformat_date(value, date_format):
+    # strptime is the slowest step of a match, and a run sees the same few hundred dates over and over
+    try:
+        return datetime.strptime(value, date_format).strftime(OUTPUT_DATE_FORMAT)
+    except ValueError:
+        return None
+
+class FieldExtractor:
+    """Extracts invoice fields from OCR text using per-vendor templates of precompiled rules.
+
+    Each rule is its own precompiled pattern and scans the text on its own, so rules that match at the
+    same offset, or inside each other's matches, all find their fields (one alternation of every rule
+    stops at the first rule that matches at an offset, and is slower too). Rules run most confident
+    first, and one whose fields are all held by surer matches already is skipped, so fallback rules
+    mostly cost nothing. Generic templates (no "match") always run. Each vendor template only runs when its vendor is found in the text, which
+    a plain substring test settles for most, so adding vendors does not slow down the others.
+    """
+
+    def __init__(self, templates):
+        self.templates = templates
+        self.rules = []  # (template index, rule index, pattern, fields, confidence, pick last, cleaning)
+        self.generic_templates = set()
+        self.shared_rules = []
+        self.vendor_checks = []  # (template index, literal hint, vendor regex, rules)
+
+        for t_index, template in enumerate(templates):
+            rules = []
+            for rule in template.get("rules", []):
+                pattern = re.compile(rule["pattern"], re.MULTILINE)
+                rules.append((
+                    t_index,
+                    len(self.rules),
+                    pattern,
+                    list(pattern.groupindex),
+                    rule["confidence"],
+                    rule.get("pick") == "last",
+                    (tuple(rule.get("remove", ())), rule.get("date_format"), rule.get("prefix")),
+                ))
+                self.rules.append(rules[-1])
+
+            if template.get("match"):
+                self.vendor_checks.append((t_index, literal_hint(template["match"]), re.compile(template["match"]),
+                                           rules))
+            else:
+                self.generic_templates.add(t_index)
+                self.shared_rules.extend(rules)
+        self.shared_rules.sort(key=lambda rule: -rule[4])
+
+    @classmethod
+    def from_file(cls, path=TEMPLATES_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def vendors(self, text):
+        # Plain substring tests weed out absent vendors before their regex runs
+        return {t_index for t_index, hint, vendor, _ in self.vendor_checks
+                if (hint is None or hint in text) and vendor.search(text)}
+
+    def extract(self, text):
+        """Return {field: FieldMatch} for every field found."""
+        vendors = self.vendors(text)
+        active = self.generic_templates | vendors
+        rules = self.shared_rules
+        if vendors:
+            rules = sorted(rules + [rule for t_index, _, _, rules in self.vendor_checks if t_index in vendors
+                                    for rule in rules], key=lambda rule: -rule[4])
+        # field -> ((confidence, position rank), value, template index, rule index, span)
+        best = {}
+
+        # Vendor templates can pin a field outright (e.g. the canonical company name)
+        for t_index in sorted(active):
+            for field, fixed in self.templates[t_index].get("fields", {}).items():
+                rank = (fixed["confidence"], 0)
+                if field not in best or rank > best[field][0]:
+                    best[field] = (rank, fixed["value"], t_index, None, None)
+
+        for t_index, r_index, pattern, fields, confidence, pick_last, cleaning in rules:
+            if all(field in best and best[field][0][0] > confidence for field in fields):
+                continue
+            for match in pattern.finditer(text):
+                # Highest confidence wins; on a tie the earliest match does, or the latest for "pick": "last"
+                position = match.start()
+                rank = (confidence, position if pick_last else -position)
+                for field in fields:
+                    current = best.get(field)
+                    if current and current[0] >= rank:
+                        continue
+                    value = self._clean(match.group(field), cleaning)
+                    if value:
+                        best[field] = (rank, value, t_index, r_index, match.span(field))
+
+        return {field: FieldMatch(value, rank[0], self.templates[t_index]["name"], r_index, span)
+                for field, (rank, value, t_index, r_index, span) in best.items()}
+
+    @staticmethod
+    def _clean(value, cleaning):
+        if value is None:
+            return None
+        remove, date_format, prefix = cleaning
+        for junk in remove:
+            value = value.replace(junk, "")
+        value = value.strip()
+        if value and date_format:
+            value = reformat_date(value, date_format)
+        if value and prefix and not value.startswith(prefix):
+            value = prefix + value
+        return value or None
+
+@lru_cache(maxsize=None)
+def templates_key(path=TEMPLATES_PATH):
+    # Fingerprint of the templates; part of the OCR cache key, since the cached fields were parsed with them
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+# === SHARED INSTANCE ===
+_extractor = None
+
+def get_extractor():
+    # Templates are loaded and compiled once per process
+    global _extractor
+    if _extractor is None:
+        _extractor = FieldExtractor.from_file()
+    return _extractor
+
+def extract_fields(text):
+    return get_extractor().extract(text)
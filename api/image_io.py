@@ -0,0 +1,146 @@
+import os
+import sys
+import math
+import logging
+
+# === CONFIG ===
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.pdf')  # Invoice files we know how to read
+WORKER_MEMORY_MB = 768  # What one OCR worker may use: the decoded page, preprocessing copies and tesseract
+PAGE_BUDGET_MB = WORKER_MEMORY_MB // 4  # Largest decoded page; preprocessing holds a few copies of it at once
+MAX_SIDE = 2500  # Pages are decoded or shrunk to at most this many pixels on their longest side
+TARGET_DPI = 300  # ...and no finer than this; tesseract gains nothing from 600-DPI scans
+PDF_DPI = 200  # Resolution PDF pages are rendered at (needs pdf2image + poppler)
+
+BYTES_PER_PIXEL = {"1": 1, "L": 1, "P": 1, "LA": 2, "I;16": 2, "RGB": 3, "YCbCr": 3, "RGBA": 4, "CMYK": 4, "I": 4, "F": 4}
+
+log = logging.getLogger(__name__)
+
+class OversizedImage(Exception):
+    """A page whose decoded size would not fit in the worker's memory budget."""
+
+# === SIZING ===
+def decoded_bytes(size, mode):
+    return size[0] * size[1] * BYTES_PER_PIXEL.get(mode, 4)
+
+def target_scale(image, max_side=MAX_SIDE, target_dpi=TARGET_DPI):
+    # Same rule as preprocess.normalize_scale: down to the target DPI, then cap the longest side
+    scale = 1.0
+    dpi = image.info.get("dpi")
+    if target_dpi and dpi and dpi[0]:
+        scale = min(1.0, target_dpi / float(dpi[0]))
+    longest = max(image.size) * scale
+    if max_side and longest > max_side:
+        scale *= max_side / longest
+    return scale
+
+def _rescale_dpi(page, original_size):
+    # Keep the declared DPI true to the new pixel size, so preprocessing does not shrink it a second time
+    dpi = page.info.get("dpi")
+    if dpi and dpi[0] and page.size != original_size:
+        factor = page.width / original_size[0]
+        page.info["dpi"] = (dpi[0] * factor, dpi[1] * factor)
+    return page
+
+# === PAGES ===
+def _load_page(image, mode, max_side, target_dpi, budget):
+    original_size = image.size
+    scale = target_scale(image, max_side, target_dpi)
+    if scale < 1.0 or (mode and mode != image.mode):
+        # JPEGs decode straight at 1/2, 1/4 or 1/8 scale (and straight to grey): the full-size
+        # bitmap is never allocated. Other formats ignore this and are decoded in full below
+        image.draft(mode or image.mode, (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+
+    if decoded_bytes(image.size, image.mode) > budget:
+        raise OversizedImage(f"{original_size[0]}x{original_size[1]} {image.mode} page needs "
+                             f"{decoded_bytes(image.size, image.mode) / 2 ** 20:.0f} MB to decode "
+                             f"(budget {budget / 2 ** 20:.0f} MB)")
+
+    # The page is the decoded image itself unless it has to be converted or reduced: no extra copies
+    image.load()
+    page = image
+    if mode and image.mode != mode:
+        page = image.convert(mode)
+        page.info = dict(image.info)
+    _rescale_dpi(page, original_size)
+
+    # Whatever draft could not shrink (PNG, TIFF, odd JPEG scales) is reduced here, before preprocessing
+    factor = int(1 / target_scale(page, max_side, target_dpi))
+    if factor > 1:
+        reduced = page.reduce(factor)
+        reduced.info = dict(page.info)
+        if page is not image:
+            page.close()
+        page = _rescale_dpi(reduced, (reduced.width * factor, reduced.height * factor))
+    return page
+
+def _pdf_pages(path, mode, max_side, target_dpi, budget):
+    try:
+        from pdf2image import convert_from_path, pdfinfo_from_path
+    except ImportError as e:
+        raise RuntimeError("PDF invoices need pdf2image (pip install pdf2image) and poppler") from e
+    for number in range(1, pdfinfo_from_path(path)["Pages"] + 1):
+        # One page rendered at a time, never the whole document
+        page = convert_from_path(path, dpi=min(PDF_DPI, target_dpi or PDF_DPI), first_page=number,
+                                 last_page=number, grayscale=mode == "L")[0]
+        page.info["dpi"] = (PDF_DPI, PDF_DPI)
+        loaded = _load_page(page, mode, max_side, target_dpi, budget)
+        if loaded is not page:
+            page.close()
+        yield loaded
+
+def open_pages(path, mode=None, max_side=MAX_SIDE, target_dpi=TARGET_DPI, budget=PAGE_BUDGET_MB * 2 ** 20):
+    """Yield the pages of an invoice file (JPEG/PNG, multi-page TIFF or PDF) one at a time.
+
+    Each page is decoded no larger than max_side / target_dpi allow, optionally straight to `mode`,
+    and closed as soon as the caller moves on to the next. A page that would not fit in `budget`
+    bytes even after draft decoding raises OversizedImage instead of being allocated.
+    """
+    if path.lower().endswith(".pdf"):
+        pages = _pdf_pages(path, mode, max_side, target_dpi, budget)
+        try:
+            for page in pages:
+                try:
+                    yield page
+                finally:
+                    page.close()
+        finally:
+            pages.close()
+        return
+
+    from PIL import Image
+    with Image.open(path) as image:
+        for index in range(getattr(image, "n_frames", 1)):
+            image.seek(index)
+            page = _load_page(image, mode, max_side, target_dpi, budget)
+            try:
+                yield page
+            finally:
+                # The file itself stays open for the next frame and is closed by the with block
+                if page is not image:
+                    page.close()
+
+def first_page(path, **kwargs):
+    # The first page only, for hashing and thumbnails; the file is closed before this returns
+    pages = open_pages(path, **kwargs)
+    try:
+        page = next(pages)
+        return page.copy()
+    finally:
+        pages.close()
+
+def peak_rss_mb():
+    # Peak resident set size of this process, for the per-worker memory report
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def memory_workers(cpu_workers, worker_mb=WORKER_MEMORY_MB):
+    # As many OCR workers as cores, but no more than fit in physical memory at worker_mb each
+    try:
+        total_mb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2 ** 20
+    except (ValueError, OSError, AttributeError):
+        return cpu_workers
+    return max(1, min(cpu_workers, total_mb // worker_mb))
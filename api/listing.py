@@ -0,0 +1,377 @@
+import re
+import time
+import logging
+import requests
+from collections import namedtuple
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from metrics import get_metrics
+from browser_pool import BrowserPool, POOL_SIZE
+
+# === CONFIG ===
+BASE_URL = "https://rpachallengeocr.azurewebsites.net/"
+DATA_ENDPOINT = "seed"  # JSON source behind the DataTables table, relative to BASE_URL
+DATA_METHOD = "POST"
+TABLE_ID = "tableSandbox"
+HTTP_TIMEOUT = 15  # Seconds
+PAGE_TIMEOUT = 10  # Seconds to wait for the table to (re)draw after a page change
+POLL_SECONDS = 0.05  # How often those waits check; WebDriverWait's default of 0.5s adds up over many pages
+PAGES_PER_TASK = 10  # Page range one browser session walks before the scheduler hands out the next range
+FAST_LISTING = True  # Try the JSON/HTML sources before starting Chrome
+
+# One row of the invoice table, whichever source produced it
+InvoiceRecord = namedtuple("InvoiceRecord", ["invoice_id", "due_date", "url"])
+
+log = logging.getLogger(__name__)
+
+HREF_PATTERN = re.compile(r"""href\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+
+# Accepted JSON keys (lowercased, punctuation stripped) for each record field
+ID_KEYS = ("id", "invoiceid")
+DUE_DATE_KEYS = ("duedate", "due")
+URL_KEYS = ("invoice", "url", "href", "link")
+
+def _pick(row, keys):
+    normalized = {re.sub(r"[^a-z]", "", str(k).lower()): v for k, v in row.items()}
+    for key in keys:
+        if normalized.get(key) not in (None, ""):
+            return str(normalized[key]).strip()
+    return None
+
+def _link_from_cell(cell):
+    # Table cells may carry the bare URL or the <a href="..."> markup around it
+    match = HREF_PATTERN.search(cell)
+    return match.group(1) if match else cell.strip()
+
+def _record_from_json(row, base_url):
+    if isinstance(row, dict):
+        invoice_id, due_date, url = _pick(row, ID_KEYS), _pick(row, DUE_DATE_KEYS), _pick(row, URL_KEYS)
+    elif isinstance(row, (list, tuple)) and len(row) >= 4:
+        # Same column order as the rendered table: #, ID, Due Date, Invoice
+        invoice_id, due_date, url = str(row[1]).strip(), str(row[2]).strip(), str(row[3])
+    else:
+        return None
+    if not (invoice_id and due_date and url):
+        return None
+    return InvoiceRecord(invoice_id, due_date, urljoin(base_url, _link_from_cell(url)))
+
+# === FAST SOURCES ===
+class JsonTableSource:
+    """Reads the whole table from the page's JSON data endpoint in one request."""
+
+    name = "json"
+
+    def __init__(self, base_url=BASE_URL, endpoint=DATA_ENDPOINT, method=DATA_METHOD, session=None):
+        self.base_url = base_url
+        self.url = urljoin(base_url, endpoint)
+        self.method = method
+        self.session = session or requests.Session()
+
+    def records(self):
+        response = self.session.request(self.method, self.url, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        payload = response.json()
+        rows = payload.get("data", []) if isinstance(payload, dict) else payload
+        for row in rows:
+            record = _record_from_json(row, self.base_url)
+            if record:
+                yield record
+
+class _TableParser(HTMLParser):
+    # Collects (cell texts, first link) for every <tbody> row of the table with the given id
+    def __init__(self, table_id):
+        super().__init__()
+        self.table_id = table_id
+        self.rows = []
+        self._table_depth = 0
+        self._in_body = False
+        self._row = None
+        self._cell = None
+        self._link = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "table":
+            if self._table_depth or attrs.get("id") == self.table_id:
+                self._table_depth += 1
+            return
+        if self._table_depth != 1:
+            return
+        if tag == "tbody":
+            self._in_body = True
+        elif tag == "tr" and self._in_body:
+            self._row, self._link = [], None
+        elif tag == "td" and self._row is not None:
+            self._cell = []
+        elif tag == "a" and self._cell is not None and self._link is None:
+            self._link = attrs.get("href")
+
+    def handle_endtag(self, tag):
+        if tag == "table" and self._table_depth:
+            self._table_depth -= 1
+        elif self._table_depth != 1:
+            return
+        elif tag == "tbody":
+            self._in_body = False
+        elif tag == "td" and self._cell is not None:
+            self._row.append("".join(self._cell).strip())
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self.rows.append((self._row, self._link))
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+class HtmlTableSource:
+    """Parses the invoice table straight out of the served HTML, no browser involved."""
+
+    name = "html"
+
+    def __init__(self, base_url=BASE_URL, table_id=TABLE_ID, session=None):
+        self.base_url = base_url
+        self.table_id = table_id
+        self.session = session or requests.Session()
+
+    def records(self):
+        response = self.session.get(self.base_url, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        parser = _TableParser(self.table_id)
+        parser.feed(response.text)
+        for cells, link in parser.rows:
+            if len(cells) >= 4 and link:
+                yield InvoiceRecord(cells[1], cells[2], urljoin(self.base_url, link))
+
+# === SELENIUM FALLBACK ===
+# All cells of the current page in one round trip: [ID, due date, invoice link] per row
+READ_ROWS_JS = """
+var rows = document.querySelectorAll('#' + arguments[0] + ' tbody tr');
+return Array.prototype.map.call(rows, function (tr) {
+    var cells = tr.querySelectorAll('td');
+    if (cells.length < 4) { return null; }
+    var link = cells[3].querySelector('a');
+    return [cells[1].innerText.trim(), cells[2].innerText.trim(), link ? link.href : null];
+}).filter(function (row) { return row !== null; });
+"""
+
+# Counts DataTables "draw" events, so a page change can be confirmed without sleeping
+HOOK_DRAWS_JS = """
+if (typeof window.__invoiceDraws === 'undefined') {
+    window.__invoiceDraws = 0;
+    if (window.jQuery) { window.jQuery('#' + arguments[0]).on('draw.dt', function () { window.__invoiceDraws++; }); }
+}
+return window.__invoiceDraws;
+"""
+DRAWS_JS = "return window.__invoiceDraws || 0;"
+
+# Jump straight to a page through the DataTables API when the page has it; false means click instead
+JUMP_TO_PAGE_JS = """
+if (!(window.jQuery && window.jQuery.fn.dataTable)) { return false; }
+window.jQuery('#' + arguments[0]).DataTable().page(arguments[1] - 1).draw('page');
+return true;
+"""
+
+class SeleniumTableSource:
+    """Walks the paginated table in headless Chrome; slow, but works when the fast sources don't.
+
+    After each page change it waits for the table to actually redraw (a DataTables draw event or the
+    old first row going stale) and then reads the whole page with one script call. Browsers come from
+    a BrowserPool, so a scheduler can walk several portals or page ranges at once on warm sessions.
+    """
+
+    name = "selenium"
+
+    def __init__(self, base_url=BASE_URL, timeout=PAGE_TIMEOUT, table_id=TABLE_ID, pool=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.table_id = table_id
+        self.pool = pool  # Shared pool; without one, records() opens and closes its own browser
+
+    def records(self):
+        pool = self.pool or BrowserPool(size=1)
+        try:
+            with pool.session() as session:
+                for _, _, rows in self.walk(session):
+                    yield from self.to_records(rows)
+        except Exception as e:
+            log.error(f"❌ Error: {str(e)}")
+            get_metrics().failure("list", "selenium_error")
+        finally:
+            if self.pool is None:
+                pool.close()
+
+    def to_records(self, rows):
+        for invoice_id, due_date_str, download_link in rows:
+            if not download_link:
+                log.error(f"❌ Error processing {invoice_id}: no invoice link")
+                get_metrics().failure("list", "missing_link", invoice_id)
+                continue
+            yield InvoiceRecord(invoice_id, due_date_str, download_link)
+
+    def walk(self, session, first_page=1, last_page=None):
+        """Yield (page, total pages, rows) for first_page..last_page (default: through the last page)."""
+        # Imported here so fast listing runs never load Selenium
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
+        driver = session.driver
+        page_started = time.perf_counter()
+        driver.get(self.base_url)
+        log.info(f"🌐 Navigating to {self.base_url}")
+
+        # Short polling: every wait below ends as soon as its condition holds
+        wait = WebDriverWait(driver, self.timeout, poll_frequency=POLL_SECONDS)
+
+        # Count total pages
+        page_buttons = wait.until(EC.presence_of_all_elements_located(
+            (By.CSS_SELECTOR, f"#{self.table_id}_paginate a.paginate_button")))
+        total_pages = len([btn for btn in page_buttons if btn.text.isdigit()])
+        last_page = min(last_page or total_pages, total_pages)
+        log.info(f"📑 Found {total_pages} pages.")
+
+        rows = wait.until(lambda d: d.execute_script(READ_ROWS_JS, self.table_id) or False)
+        current_page = 1
+        for page in range(first_page, last_page + 1):
+            if page != current_page:
+                rows = self._go_to_page(driver, wait, page, current_page, rows[0][0] if rows else None)
+                current_page = page
+            page_seconds = time.perf_counter() - page_started
+            log.info(f"📄 Page {page}/{total_pages}: {len(rows)} rows in {page_seconds:.2f}s")
+            get_metrics().record(None, "list_page", page_seconds, page=page, rows=len(rows), portal=self.base_url)
+            session.page_done()
+            yield page, total_pages, rows
+            page_started = time.perf_counter()
+
+    def _go_to_page(self, driver, wait, page_number, current_page, old_first_id):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+
+        while True:
+            draws = driver.execute_script(HOOK_DRAWS_JS, self.table_id)
+            try:
+                old_first_row = driver.find_element(By.CSS_SELECTOR, f"#{self.table_id} tbody tr")
+            except NoSuchElementException:
+                old_first_row = None
+
+            target = page_number
+            if not driver.execute_script(JUMP_TO_PAGE_JS, self.table_id, page_number):
+                try:
+                    # First approach: find by text
+                    button = wait.until(EC.element_to_be_clickable(
+                        (By.XPATH, f"//div[@id='{self.table_id}_paginate']//a[contains(@class, 'paginate_button') and text()='{page_number}']")
+                    ))
+                except Exception:
+                    # Alternative approach: use the "Next" button, one page at a time
+                    button = wait.until(EC.element_to_be_clickable((By.ID, f"{self.table_id}_next")))
+                    target = current_page + 1
+                button.click()
+
+            def redrawn(d):
+                # The table changed once DataTables reports a draw or the old first row is detached;
+                # comparing the first ID guards against reading the previous page's rows again
+                if d.execute_script(DRAWS_JS) == draws and old_first_row is not None:
+                    try:
+                        old_first_row.is_enabled()
+                        return False
+                    except StaleElementReferenceException:
+                        pass
+                rows = d.execute_script(READ_ROWS_JS, self.table_id)
+                return rows if rows and rows[0][0] != old_first_id else False
+
+            rows = wait.until(redrawn)
+            if target == page_number:
+                return rows
+            current_page, old_first_id = target, rows[0][0]
+
+# === SCRAPING MANY PORTALS ===
+class ScrapeScheduler:
+    """Scrapes several portals at once over a BrowserPool, splitting long tables into page ranges.
+
+    Each portal's first range also reveals its page count; the remaining ranges are then queued, so
+    idle sessions pick up pages of whichever portal still has work. Ranges are handed back as they
+    finish, so a slow portal never holds back the records of the others.
+    """
+
+    def __init__(self, pool=None, pages_per_task=PAGES_PER_TASK, timeout=PAGE_TIMEOUT, table_id=TABLE_ID):
+        self.pool = pool or BrowserPool(POOL_SIZE)
+        self.pages_per_task = pages_per_task
+        self.timeout = timeout
+        self.table_id = table_id
+
+    def _scrape_range(self, base_url, first_page, last_page):
+        source = SeleniumTableSource(base_url, self.timeout, self.table_id, pool=self.pool)
+        pages, total_pages = {}, 0
+        with self.pool.session() as session:
+            for page, total_pages, rows in source.walk(session, first_page, last_page):
+                pages[page] = list(source.to_records(rows))
+        return total_pages, pages
+
+    def iter_scrape(self, portals):
+        """Yield (portal base URL, page, [InvoiceRecord, ...]) as each page range finishes; failed ranges are skipped."""
+        executor = ThreadPoolExecutor(max_workers=self.pool.size, thread_name_prefix="scrape")
+        try:
+            pending = {executor.submit(self._scrape_range, portal, 1, self.pages_per_task): (portal, 1)
+                       for portal in portals}
+            while pending:
+                # as_completed, over a set that grows: a first range queues the rest of its portal
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    portal, start = pending.pop(future)
+                    try:
+                        total_pages, portal_pages = future.result()
+                    except Exception as e:
+                        where = f" from page {start}" if start > 1 else ""
+                        log.error(f"❌ Error scraping {portal}{where}: {e}")
+                        get_metrics().failure("list", "selenium_error")
+                        continue
+                    if start == 1:
+                        for next_start in range(self.pages_per_task + 1, total_pages + 1, self.pages_per_task):
+                            future = executor.submit(self._scrape_range, portal, next_start,
+                                                     next_start + self.pages_per_task - 1)
+                            pending[future] = (portal, next_start)
+                    for page in sorted(portal_pages):
+                        yield portal, page, portal_pages[page]
+        finally:
+            # A caller that stops early must not wait for ranges nobody will read
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def scrape(self, portals):
+        """Return {portal base URL: [InvoiceRecord, ...] in page order}; a failed portal maps to what was read."""
+        pages = {portal: {} for portal in portals}
+        for portal, page, records in self.iter_scrape(portals):
+            pages[portal][page] = records
+        return {portal: [record for page in sorted(pages[portal]) for record in pages[portal][page]]
+                for portal in portals}
+
+    def close(self):
+        self.pool.close()
+
+# === LISTING ===
+def default_fast_sources(base_url=BASE_URL):
+    session = requests.Session()
+    return [JsonTableSource(base_url, session=session), HtmlTableSource(base_url, session=session)]
+
+def list_invoices(base_url=BASE_URL, fast=FAST_LISTING, fast_sources=None, fallback=None):
+    """Yield InvoiceRecords from the first fast source that returns rows, else from the fallback (Selenium)."""
+    if fast:
+        for source in fast_sources or default_fast_sources(base_url):
+            try:
+                records = list(source.records())
+            except Exception as e:
+                log.warning(f"⚠️ {source.name} listing failed: {e}")
+                get_metrics().failure("list", f"{source.name}_source_failed")
+                continue
+            if records:
+                log.info(f"⚡ Listed {len(records)} invoices via {source.name}")
+                yield from records
+                return
+            log.warning(f"⚠️ {source.name} listing returned no rows")
+
+    # Stream straight from the fallback so downloads still overlap the page walk
+    log.warning("🐢 Falling back to the Selenium listing")
+    fallback = fallback or SeleniumTableSource(base_url)
+    yield from fallback.records()
@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# === CONFIG ===
+MANIFEST_PATH = "run_manifest.sqlite"
+
+# Lifecycle of an invoice, in order
+LISTED = "listed"
+DOWNLOADED = "downloaded"
+OCRD = "ocrd"
+EMITTED = "emitted"
+FAILED = "failed"  # OCR gave no fields; read again on the next run, like a fresh download
+STATES = (LISTED, DOWNLOADED, OCRD, EMITTED, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    invoice_id TEXT PRIMARY KEY,
+    due_date TEXT,
+    url TEXT,
+    state TEXT NOT NULL,
+    file_path TEXT,
+    checksum TEXT,
+    fields TEXT,
+    duplicate_of TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_invoices_state ON invoices (state);
+"""
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class RunManifest:
+    """Persistent per-invoice progress, so a rerun resumes instead of starting over."""
+
+    def __init__(self, path=MANIFEST_PATH):
+        # Download threads report completions too, so share one connection behind a lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(invoices)")}
+        if "duplicate_of" not in columns:
+            # Manifests written before duplicate detection
+            self.conn.execute("ALTER TABLE invoices ADD COLUMN duplicate_of TEXT")
+        # Manifests written before failures had their own state kept them as OCR'd with no fields
+        self.conn.execute("UPDATE invoices SET state = ? WHERE state = ? AND fields IS NULL", (FAILED, OCRD))
+
+    def _execute(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _row(self, invoice_id):
+        rows = self._execute("SELECT state, file_path, checksum FROM invoices WHERE invoice_id = ?", (invoice_id,))
+        return rows[0] if rows else None
+
+    # === LISTING ===
+    def mark_listed(self, invoice_id, due_date, url):
+        # Refresh the listing data but never move an invoice backwards
+        self._execute(
+            """INSERT INTO invoices (invoice_id, due_date, url, state, updated_at) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (invoice_id) DO UPDATE SET due_date = excluded.due_date, url = excluded.url""",
+            (invoice_id, due_date, url, LISTED, time.time()),
+        )
+
+    def due_date(self, invoice_id):
+        rows = self._execute("SELECT due_date FROM invoices WHERE invoice_id = ?", (invoice_id,))
+        return rows[0][0] if rows else None
+
+    def due_dates(self):
+        return dict(self._execute("SELECT invoice_id, due_date FROM invoices WHERE due_date IS NOT NULL"))
+
+    # === DOWNLOAD ===
+    def is_downloaded(self, invoice_id):
+        # Trust the manifest only while the file on disk still has the recorded checksum
+        row = self._row(invoice_id)
+        if row is None or row[0] == LISTED or not row[1] or not os.path.isfile(row[1]):
+            return False
+        return file_checksum(row[1]) == row[2]
+
+    def mark_downloaded(self, invoice_id, file_path):
+        # Returns True when the file needs OCR, False when its bytes were already processed
+        checksum = file_checksum(file_path)
+        row = self._row(invoice_id)
+        if row and row[0] not in (LISTED, FAILED) and row[2] == checksum:
+            # Same bytes as before: keep whatever OCR/emit progress we already have
+            self._execute("UPDATE invoices SET file_path = ? WHERE invoice_id = ?", (file_path, invoice_id))
+            return False
+        self._execute(
+            """INSERT INTO invoices (invoice_id, state, file_path, checksum, updated_at) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (invoice_id) DO UPDATE SET state = excluded.state, file_path = excluded.file_path,
+               checksum = excluded.checksum, fields = NULL, duplicate_of = NULL, updated_at = excluded.updated_at""",
+            (invoice_id, DOWNLOADED, file_path, checksum, time.time()),
+        )
+        return True
+
+    def adopt_files(self, directory, extensions):
+        # Images already on disk from earlier runs that the manifest never saw
+        known = {row[0] for row in self._execute("SELECT invoice_id FROM invoices WHERE state != ?", (LISTED,))}
+        for filename in sorted(os.listdir(directory)):
+            invoice_id = os.path.splitext(filename)[0]
+            path = os.path.join(directory, filename)
+            if invoice_id not in known and filename.lower().endswith(extensions) and os.path.isfile(path):
+                self.mark_downloaded(invoice_id, path)
+
+    # === OCR ===
+    def pending_ocr(self):
+        # Downloaded but never read, and failed reads to try again
+        return self._execute("SELECT invoice_id, file_path FROM invoices WHERE state IN (?, ?) ORDER BY invoice_id",
+                             (DOWNLOADED, FAILED))
+
+    def mark_ocrd(self, invoice_id, fields, duplicate_of=None):
+        # fields is None when extraction failed: the invoice is marked failed, for the next run to retry.
+        # duplicate_of: the earlier invoice whose scan this is (see dedup.py)
+        self._execute(
+            "UPDATE invoices SET state = ?, fields = ?, duplicate_of = ?, updated_at = ? WHERE invoice_id = ?",
+            (OCRD if fields else FAILED, json.dumps(list(fields)) if fields else None, duplicate_of, time.time(),
+             invoice_id),
+        )
+
+    # === OUTPUT ===
+    def pending_emit(self):
+        rows = self._execute(
+            """SELECT invoice_id, due_date, fields, duplicate_of FROM invoices
+               WHERE state = ? AND fields IS NOT NULL ORDER BY invoice_id""",
+            (OCRD,),
+        )
+        return [(invoice_id, due_date, tuple(json.loads(fields)), duplicate_of)
+                for invoice_id, due_date, fields, duplicate_of in rows]
+
+    def emitted_fields(self):
+        rows = self._execute("SELECT fields FROM invoices WHERE state = ? AND fields IS NOT NULL", (EMITTED,))
+        return [tuple(json.loads(fields)) for fields, in rows]
+
+    def mark_emitted(self, invoice_ids):
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE invoices SET state = ?, updated_at = ? WHERE invoice_id = ?",
+                [(EMITTED, now, invoice_id) for invoice_id in invoice_ids],
+            )
+
+    def status(self, invoice_id):
+        rows = self._execute(
+            "SELECT state, due_date, file_path, fields, duplicate_of, updated_at FROM invoices WHERE invoice_id = ?",
+            (invoice_id,),
+        )
+        if not rows:
+            return None
+        state, due_date, file_path, fields, duplicate_of, updated_at = rows[0]
+        return {"invoice_id": invoice_id, "state": state, "due_date": due_date, "file_path": file_path,
+                "fields": json.loads(fields) if fields else None, "duplicate_of": duplicate_of,
+                "updated_at": updated_at}
+
+    def counts(self):
+        counts = dict(self._execute("SELECT state, COUNT(*) FROM invoices GROUP BY state"))
+        return {state: counts.get(state, 0) for state in STATES}
+
+    def close(self):
+        self.conn.close()
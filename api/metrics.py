@@ -0,0 +1,193 @@
+import os
+import json
+import math
+import time
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# === CONFIG ===
+LOG_LEVEL = "INFO"  # DEBUG also logs every download and skipped invoice
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(message)s"
+REPORT_PATH = "run_report.jsonl"  # One line per span and failure, then a summary line; appended run after run
+PROMETHEUS_PATH = "invoice_pipeline.prom"  # Rewritten at the end of each run, for node_exporter's textfile collector
+METRIC_PREFIX = "invoice_pipeline"
+QUANTILES = (0.5, 0.95)
+
+# The mode open() gives a new file: 0666 less the umask. mkstemp files start out 0600 instead. Read once
+# at import, as the umask can only be read by setting it, which would race with other threads later
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+NEW_FILE_MODE = 0o666 & ~_UMASK
+
+log = logging.getLogger(__name__)
+
+def setup_logging(level=LOG_LEVEL):
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+def quantile(values, q):
+    # Nearest-rank quantile of an unsorted sample
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)] if ordered else None
+
+def _labels(labels):
+    return ",".join(f'{key}="{str(value)}"' for key, value in labels)
+
+class RunMetrics:
+    """Spans (invoice, stage, duration) and labelled counters for one run.
+
+    Spans and failures are appended to the JSON-lines report as they happen, so a crashed run still
+    leaves a record; finish() adds the run summary and writes the Prometheus text file.
+    """
+
+    def __init__(self, report_path=REPORT_PATH, prometheus_path=PROMETHEUS_PATH):
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.report_path = report_path
+        self.prometheus_path = prometheus_path
+        self.started = time.time()
+        # Download threads, the OCR stage and the writer all report here
+        self.lock = threading.Lock()
+        self.durations = {}  # stage -> [seconds]
+        self.bytes = {}  # stage -> bytes moved
+        self.counters = {}  # (name, ((label, value), ...)) -> count
+        self._report = None
+        self.finished = False
+
+    # === RECORDING ===
+    def record(self, invoice_id, stage, seconds, status="ok", started=None, **attrs):
+        event = {"type": "span", "run": self.run_id, "invoice_id": invoice_id, "stage": stage,
+                 "start": round(time.time() - seconds if started is None else started, 6),
+                 "seconds": round(seconds, 6), "status": status, **attrs}
+        with self.lock:
+            self.durations.setdefault(stage, []).append(seconds)
+            if attrs.get("bytes"):
+                self.bytes[stage] = self.bytes.get(stage, 0) + attrs["bytes"]
+            self._write(event)
+
+    @contextmanager
+    def span(self, invoice_id, stage, **attrs):
+        # Times the block; it may add attributes (bytes, status...) to the yielded dict
+        started, clock = time.time(), time.perf_counter()
+        try:
+            yield attrs
+        except Exception as e:
+            self.failure(stage, type(e).__name__, invoice_id)
+            self.record(invoice_id, stage, time.perf_counter() - clock, "error", started, **attrs)
+            raise
+        status = attrs.pop("status", "ok")
+        self.record(invoice_id, stage, time.perf_counter() - clock, status, started, **attrs)
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def failure(self, stage, reason, invoice_id=None):
+        self.count("failures", stage=stage, reason=reason)
+        with self.lock:
+            self._write({"type": "failure", "run": self.run_id, "invoice_id": invoice_id, "stage": stage,
+                         "reason": reason, "time": round(time.time(), 6)})
+
+    def _write(self, event):
+        # Caller holds the lock
+        if self._report is None:
+            self._report = open(self.report_path, "a", encoding="utf-8")
+        self._report.write(json.dumps(event) + "\n")
+        self._report.flush()
+
+    # === EXPORT ===
+    def summary(self):
+        with self.lock:
+            stages = {
+                stage: {
+                    "count": len(values),
+                    "seconds": round(sum(values), 6),
+                    **{f"p{round(q * 100)}": round(quantile(values, q), 6) for q in QUANTILES},
+                    "bytes": self.bytes.get(stage, 0),
+                }
+                for stage, values in self.durations.items()
+            }
+            counters = [{"name": name, **dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+        return {"type": "summary", "run": self.run_id, "started": round(self.started, 6),
+                "seconds": round(time.time() - self.started, 6), "stages": stages, "counters": counters}
+
+    def prometheus_text(self, summary=None):
+        summary = summary or self.summary()
+        p = METRIC_PREFIX
+        lines = [
+            f"# HELP {p}_stage_seconds Seconds spent per invoice in each pipeline stage during the last run.",
+            f"# TYPE {p}_stage_seconds summary",
+        ]
+        for stage, stats in sorted(summary["stages"].items()):
+            for q in QUANTILES:
+                lines.append(f'{p}_stage_seconds{{stage="{stage}",quantile="{q}"}} {stats[f"p{round(q * 100)}"]}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {stats["seconds"]}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        lines += [f"# HELP {p}_stage_bytes_total Bytes moved per stage during the last run.",
+                  f"# TYPE {p}_stage_bytes_total counter"]
+        lines += [f'{p}_stage_bytes_total{{stage="{stage}"}} {stats["bytes"]}'
+                  for stage, stats in sorted(summary["stages"].items()) if stats["bytes"]]
+
+        names = sorted({counter["name"] for counter in summary["counters"]})
+        for name in names:
+            lines += [f"# HELP {p}_{name}_total Events counted during the last run.", f"# TYPE {p}_{name}_total counter"]
+            for counter in summary["counters"]:
+                if counter["name"] == name:
+                    labels = [(k, v) for k, v in counter.items() if k not in ("name", "value")]
+                    lines.append(f"{p}_{name}_total{{{_labels(labels)}}} {counter['value']}")
+
+        lines += [
+            f"# HELP {p}_run_seconds Wall time of the last run.",
+            f"# TYPE {p}_run_seconds gauge",
+            f"{p}_run_seconds {summary['seconds']}",
+            f"# HELP {p}_run_finished_timestamp_seconds When the last run finished.",
+            f"# TYPE {p}_run_finished_timestamp_seconds gauge",
+            f"{p}_run_finished_timestamp_seconds {round(time.time(), 3)}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, summary=None):
+        # Atomic replace: the textfile collector must never scrape a half-written file. It often runs as
+        # another user, so the file gets the usual 0644 (under umask 022), not mkstemp's 0600
+        directory = os.path.dirname(os.path.abspath(self.prometheus_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".prom.part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text(summary))
+            os.chmod(tmp_path, 0o644 & NEW_FILE_MODE)
+            os.replace(tmp_path, self.prometheus_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def finish(self):
+        """Append the run summary to the report, write the Prometheus file and log where the time went."""
+        summary = self.summary()
+        with self.lock:
+            self._write(summary)
+            self._report.close()
+            self._report = None
+        self.write_prometheus(summary)
+        self.finished = True
+
+        for stage, stats in summary["stages"].items():
+            log.info(f"⏱️ {stage:<20} {stats['count']:5d} spans, {stats['seconds']:8.2f}s total, "
+                     f"p50 {stats['p50']:.3f}s, p95 {stats['p95']:.3f}s")
+        for counter in summary["counters"]:
+            if counter["name"] == "failures":
+                log.warning(f"❌ {counter['value']} {counter['stage']} failures: {counter['reason']}")
+        log.info(f"📊 Run report appended to {self.report_path}, metrics written to {self.prometheus_path}")
+        return summary
+
+# === PER-PROCESS RUN ===
+_metrics = {}
+
+def get_metrics():
+    # One run per process at a time (a finished run is replaced by a fresh one); OCR workers hand
+    # their timings back to the parent instead of recording here
+    pid = os.getpid()
+    if pid not in _metrics or _metrics[pid].finished:
+        _metrics[pid] = RunMetrics()
+    return _metrics[pid]
@@ -0,0 +1,157 @@
+import os
+import shlex
+import logging
+import subprocess
+import importlib.util
+from functools import lru_cache
+from collections import namedtuple
+
+# === CONFIG ===
+OCR_BACKEND = "auto"  # "tesserocr" (persistent engine), "pytesseract" (process per image) or "auto"
+OCR_LANG = "eng"
+TESSERACT_CMD = "tesseract"  # Only asked for its version; pytesseract has its own tesseract_cmd setting
+
+log = logging.getLogger(__name__)
+
+# One recognized word: tesseract's 0-100 confidence, its (block, paragraph, line) and its pixel box
+OcrWord = namedtuple("OcrWord", ["text", "confidence", "line", "box"])
+
+def parse_tesseract_config(config):
+    # Split tesseract CLI flags ("--psm 6 -c key=value") into a page segmentation mode and variables
+    psm, variables = None, {}
+    tokens = shlex.split(config or "")
+    for i, token in enumerate(tokens[:-1]):
+        if token == "--psm":
+            psm = int(tokens[i + 1])
+        elif token == "-c" and "=" in tokens[i + 1]:
+            key, value = tokens[i + 1].split("=", 1)
+            variables[key] = value
+    return psm, variables
+
+def parse_tsv(tsv):
+    # Tesseract's TSV output (image_to_data): one row per page/block/paragraph/line/word; keep the words
+    words = []
+    for row in tsv.splitlines()[1:]:
+        cells = row.split("\t")
+        if len(cells) < 12 or cells[0] != "5" or not cells[11].strip():
+            continue
+        left, top, width, height = (int(cell) for cell in cells[6:10])
+        words.append(OcrWord(cells[11].strip(), float(cells[10]), (int(cells[2]), int(cells[3]), int(cells[4])),
+                             (left, top, left + width, top + height)))
+    return words
+
+# === BACKENDS ===
+class PytesseractBackend:
+    """Fallback: every call forks a tesseract process, which reloads the language model."""
+
+    name = "pytesseract"
+
+    def __init__(self, config="", lang=OCR_LANG):
+        import pytesseract
+        self.pytesseract = pytesseract
+        self.config = config
+        self.lang = lang
+        self._version = None
+
+    def version(self):
+        if self._version is None:
+            self._version = f"{self.name}-{self.pytesseract.get_tesseract_version()}"
+        return self._version
+
+    def image_to_string(self, image):
+        return self.pytesseract.image_to_string(image, lang=self.lang, config=self.config)
+
+    def image_to_data(self, image, config=None):
+        # config adds flags for this image only; tesseract takes the last --psm it is given
+        config = f"{self.config} {config}" if config else self.config
+        return parse_tsv(self.pytesseract.image_to_data(image, lang=self.lang, config=config))
+
+    def close(self):
+        pass
+
+class TesserocrBackend:
+    """Long-lived tesseract engine via the C API: the model is loaded once and reused for every image."""
+
+    name = "tesserocr"
+
+    def __init__(self, config="", lang=OCR_LANG):
+        import tesserocr
+        self.tesserocr = tesserocr
+        psm, variables = parse_tesseract_config(config)
+        kwargs = {"lang": lang}
+        if psm is not None:
+            kwargs["psm"] = psm
+        self.api = tesserocr.PyTessBaseAPI(**kwargs)
+        for key, value in variables.items():
+            self.api.SetVariable(key, value)
+        self.psm = self.api.GetPageSegMode()
+
+    def version(self):
+        return f"{self.name}-{self.tesserocr.tesseract_version().split()[1]}"
+
+    def image_to_string(self, image):
+        self.api.SetImage(image)
+        return self.api.GetUTF8Text()
+
+    def image_to_data(self, image, config=None):
+        # config adds flags for this image only: they are set on the loaded engine and undone after, so a
+        # different page segmentation mode never costs a second copy of the model
+        psm, variables = parse_tesseract_config(config)
+        previous = {key: self.api.GetVariableAsString(key) for key in variables}
+        if psm is not None:
+            self.api.SetPageSegMode(psm)
+        for key, value in variables.items():
+            self.api.SetVariable(key, value)
+        try:
+            self.api.SetImage(image)
+            # The C API leaves out the header row the tesseract CLI writes
+            return parse_tsv("level\n" + self.api.GetTSVText(0))
+        finally:
+            if psm is not None:
+                self.api.SetPageSegMode(self.psm)
+            for key, value in previous.items():
+                self.api.SetVariable(key, value)
+
+    def close(self):
+        self.api.End()
+
+BACKENDS = {
+    "tesserocr": TesserocrBackend,
+    "pytesseract": PytesseractBackend,
+}
+
+def create_backend(name=OCR_BACKEND, config=""):
+    if name != "auto":
+        return BACKENDS[name](config)
+    try:
+        return TesserocrBackend(config)
+    except Exception as e:
+        # tesserocr is optional (it needs libtesseract headers to build); the CLI always works
+        log.warning(f"⚠️ tesserocr unavailable ({e}); falling back to pytesseract")
+        return PytesseractBackend(config)
+
+@lru_cache(maxsize=None)
+def engine_version(name=OCR_BACKEND):
+    """'<backend>-<tesseract version>', as the engine's version() says, without starting an engine.
+
+    Part of every OCR cache key, so a fully cached run must not pay for it: no engine, no PIL import,
+    one `tesseract --version` per process.
+    """
+    if name == "auto":
+        name = "tesserocr" if importlib.util.find_spec("tesserocr") else "pytesseract"
+    try:
+        output = subprocess.run([TESSERACT_CMD, "--version"], capture_output=True, text=True, check=True)
+        return f"{name}-{(output.stdout or output.stderr).split()[1]}"
+    except (OSError, subprocess.CalledProcessError, IndexError):
+        # No tesseract CLI on the PATH (tesserocr only needs the library): ask the engine after all
+        return get_backend(name).version()
+
+# === PER-PROCESS ENGINE ===
+_backends = {}
+
+def get_backend(name=OCR_BACKEND, config=""):
+    # One engine per worker process, configured once and reused for every image it OCRs
+    key = (os.getpid(), name, config)
+    if key not in _backends:
+        _backends[key] = create_backend(name, config)
+    return _backends[key]
@@ -0,0 +1,92 @@
+import os
+import json
+import time
+import sqlite3
+from manifest import file_checksum
+
+# === CONFIG ===
+CACHE_PATH = "ocr_cache.sqlite"  # Shared by every OCR worker
+MAX_CACHE_BYTES = 256 * 1024 * 1024  # Stored text + fields; least recently used entries go first
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_results (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    fields TEXT,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ocr_results_last_access ON ocr_results (last_access);
+CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+"""
+
+def file_cache_key(path, engine_version, config):
+    # Same bytes through a different tesseract build or config may read differently. The file is hashed in
+    # blocks, so a large scan is never read into memory whole
+    return f"{file_checksum(path)}:{engine_version}:{config}"
+
+class OcrCache:
+    """Content-addressed store of OCR text and parsed fields, capped by size with LRU eviction."""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        # Several worker processes write here at once; WAL plus a generous busy timeout keeps them out of each other's way
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def get(self, key):
+        # Returns (text, fields) or None; fields is None when parsing found nothing usable
+        row = self.conn.execute("SELECT text, fields FROM ocr_results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._bump("misses")
+            return None
+        self.conn.execute("UPDATE ocr_results SET last_access = ? WHERE key = ?", (time.time(), key))
+        self._bump("hits")
+        text, fields = row
+        return text, tuple(json.loads(fields)) if fields else None
+
+    def put(self, key, text, fields):
+        fields_json = json.dumps(list(fields)) if fields else None
+        size = len(text.encode()) + len(fields_json or "")
+        self.conn.execute(
+            "INSERT OR REPLACE INTO ocr_results (key, text, fields, size, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, text, fields_json, size, time.time()),
+        )
+        self._evict()
+
+    def stats(self):
+        counters = dict(self.conn.execute("SELECT name, value FROM stats"))
+        entries, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_results").fetchone()
+        return {**counters, "entries": entries, "bytes": total}
+
+    def close(self):
+        self.conn.close()
+
+    def _bump(self, name, amount=1):
+        self.conn.execute("UPDATE stats SET value = value + ? WHERE name = ?", (amount, name))
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self.conn.execute("SELECT key, size FROM ocr_results ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM ocr_results WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self._bump("evictions", evicted)
+
+# === PER-PROCESS HANDLE ===
+_caches = {}
+
+def get_cache(path=CACHE_PATH):
+    # SQLite connections must not cross a fork, so each worker process opens its own
+    handle_key = (os.getpid(), path)
+    if handle_key not in _caches:
+        _caches[handle_key] = OcrCache(path)
+    return _caches[handle_key]
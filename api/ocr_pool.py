@@ -0,0 +1,118 @@
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from image_io import memory_workers, WORKER_MEMORY_MB
+
+# === CONFIG ===
+# One tesseract process per core, as long as each gets WORKER_MEMORY_MB (see image_io.py)
+OCR_WORKERS = memory_workers(os.cpu_count() or 1, WORKER_MEMORY_MB)
+CHUNK_SIZE = None  # Images per work item; None picks a size from the batch length
+
+log = logging.getLogger(__name__)
+
+# === WORKER SIDE ===
+def init_worker(warm_fn=None):
+    # Tesseract spins up its own OpenMP threads; with one process per core they only fight each other
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    if warm_fn:
+        # Once in every worker, before its first task, so that task does not pay for imports and engine start-up
+        try:
+            warm_fn()
+        except Exception as e:
+            # A failed initializer breaks the whole pool; the invoices themselves will report the problem
+            log.warning(f"⚠️ OCR worker warm-up failed: {e}")
+
+def extract_one(extract_fn, image_path):
+    # A corrupt image must only cost its own row, never the whole chunk
+    try:
+        return extract_fn(image_path)
+    except Exception as e:
+        log.error(f"❌ Worker failed on {image_path}: {e}")
+        return None
+
+def _extract_chunk(extract_fn, image_paths):
+    return [extract_one(extract_fn, image_path) for image_path in image_paths]
+
+def _pick_chunk_size(total, workers):
+    # Roughly four chunks per worker keeps the queue balanced without paying IPC per image
+    return max(1, total // (workers * 4))
+
+# === PARALLEL EXTRACTION ===
+def new_pool(workers, warm_fn=None):
+    # warm_fn (e.g. loading the OCR engine) runs in each worker process as it starts
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(warm_fn,))
+
+def start_workers(pool, workers):
+    # Processes otherwise start as the first tasks arrive; each runs the initializer before taking any task,
+    # so once these return every worker is up (and warm)
+    for future in [pool.submit(os.getpid) for _ in range(workers)]:
+        future.result()
+
+def extract_alone(extract_fn, image_paths):
+    """Run extract_fn over image_paths one at a time in a worker process; an image that crashes it gets None.
+
+    For the images a crashed pool took down with it: a crash breaks every task in flight, so only
+    running them alone tells which image actually kills a worker.
+    """
+    results = []
+    pool = new_pool(1)
+    try:
+        for image_path in image_paths:
+            try:
+                results.append(pool.submit(extract_one, extract_fn, image_path).result())
+            except BrokenProcessPool:
+                log.error(f"❌ {image_path} crashed an OCR worker")
+                results.append(None)
+                pool.shutdown()
+                pool = new_pool(1)
+    finally:
+        pool.shutdown()
+    return results
+
+def _iter_pool(image_paths, extract_fn, workers, chunk_size):
+    chunks = [image_paths[i:i + chunk_size] for i in range(0, len(image_paths), chunk_size)]
+    pool = new_pool(workers)
+    try:
+        futures = [pool.submit(_extract_chunk, extract_fn, chunk) for chunk in chunks]
+        for index, chunk in enumerate(chunks):
+            try:
+                results = futures[index].result()
+            except BrokenProcessPool:
+                # A worker died (e.g. a decoder crash) and took every unfinished chunk with it: resubmit those
+                # to a new pool, and re-run this chunk's images alone so only one that crashes again is lost
+                log.error(f"❌ An OCR worker died; re-running {len(chunk)} images starting at {chunk[0]} one by one")
+                pool.shutdown(cancel_futures=True)
+                pool = new_pool(workers)
+                for later in range(index + 1, len(chunks)):
+                    if isinstance(futures[later].exception(), BrokenProcessPool):
+                        futures[later] = pool.submit(_extract_chunk, extract_fn, chunks[later])
+                results = extract_alone(extract_fn, chunk)
+            yield from results
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+def iter_extract(image_paths, extract_fn, workers=OCR_WORKERS, chunk_size=CHUNK_SIZE):
+    """Run extract_fn over image_paths on a process pool, yielding results in input order as chunks finish.
+
+    An image that fails, or crashes its worker, yields None.
+    """
+    image_paths = list(image_paths)
+    total = len(image_paths)
+    workers = max(1, min(workers, total))
+    started = time.perf_counter()
+
+    if workers == 1:
+        results = (extract_one(extract_fn, image_path) for image_path in image_paths)
+    else:
+        results = _iter_pool(image_paths, extract_fn, workers, chunk_size or _pick_chunk_size(total, workers))
+    succeeded = 0
+    for result in results:
+        succeeded += result is not None
+        yield result
+
+    elapsed = time.perf_counter() - started
+    rate = succeeded / elapsed if elapsed > 0 else 0.0
+    failed = f", {total - succeeded} failed" if succeeded < total else ""
+    log.info(f"⚡ OCR'd {succeeded} invoices in {elapsed:.1f}s ({rate:.2f} invoices/s, {workers} workers{failed})")
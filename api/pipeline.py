@@ -0,0 +1,330 @@
+import os
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from downloader import InvoiceDownloader, MAX_CONCURRENT_DOWNLOADS
+from listing import list_invoices
+from ocr_pool import OCR_WORKERS, new_pool, start_workers, extract_one, extract_alone
+from extract import extract_invoice_timed, record_extraction, ocr_engine
+from metrics import get_metrics
+from dedup import DuplicateIndex, USE_DEDUP
+from image_io import IMAGE_EXTENSIONS
+from sinks import BatchWriter, open_sinks, OUTPUT_FORMATS, BATCH_SIZE, FLUSH_SECONDS
+from postprocess import RowValidator, rejects_path
+
+# === CONFIG ===
+QUEUE_SIZE = 32  # Items buffered between two stages; a full queue pauses the stage feeding it
+QUEUE_POLL_SECONDS = 0.1  # How often a stage blocked on a queue checks whether the run was aborted
+JOIN_SECONDS = 30  # How long the run waits for each stage thread once the outputs are written
+
+_DONE = object()  # End-of-stream marker passed down the queues
+
+log = logging.getLogger(__name__)
+
+class InvoicePipeline:
+    """Streams invoices through list -> download -> OCR -> output sinks, with bounded queues between stages."""
+
+    def __init__(self, download_dir, output_csv, manifest, records=None, queue_size=QUEUE_SIZE,
+                 download_workers=MAX_CONCURRENT_DOWNLOADS, ocr_workers=OCR_WORKERS,
+                 output_formats=OUTPUT_FORMATS, batch_size=BATCH_SIZE, warm_workers=False):
+        self.download_dir = download_dir
+        self.output_csv = output_csv
+        self.output_formats = output_formats  # CSV, plus Parquet/SQLite next to it if listed (see sinks.py)
+        self.batch_size = batch_size
+        self.manifest = manifest
+        self.records = records  # Any iterable of InvoiceRecords; defaults to list_invoices()
+        self.download_workers = download_workers
+        self.ocr_workers = ocr_workers
+        # Two images per OCR process keeps every core busy while one result is being handed back
+        self.max_inflight = ocr_workers * 2
+        self.warm_workers = warm_workers  # Start every OCR process and its engine before the first invoice
+        self.inflight = {}  # Future -> (invoice_id, path) being OCR'd
+        self.copies = {}  # Original invoice_id -> [(invoice_id, path)] exact copies waiting for its fields
+        self.pool = None  # The OCR process pool, replaced if a worker crash breaks it
+        self.validator = None
+        self.aborted = threading.Event()  # Set when the OCR stage gives up; stages feeding it then stop
+
+        self.download_q = queue.Queue(maxsize=queue_size)
+        self.ocr_q = queue.Queue(maxsize=queue_size)
+        self.row_q = queue.Queue(maxsize=queue_size)
+        self.downloader = InvoiceDownloader(download_dir, max_workers=download_workers)
+        # Exact copies of an earlier invoice skip OCR; re-issued scans are flagged once read (see dedup.py)
+        self.dedup = DuplicateIndex() if USE_DEDUP else None
+
+    def run(self):
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self._list_stage, name="list", daemon=True)]
+        threads += [threading.Thread(target=self._download_stage, name=f"download-{i}", daemon=True)
+                    for i in range(self.download_workers)]
+        threads.append(threading.Thread(target=self._ocr_stage, name="ocr", daemon=True))
+        for thread in threads:
+            thread.start()
+
+        # The output writer runs here, so the run ends once the last batch is flushed
+        written = self._write_stage(started)
+        self._join(threads)
+        self.downloader.close()
+        if self.dedup:
+            log.info(f"👯 Duplicate index: {self.dedup.counts()}")
+            self.dedup.close()
+
+        log.info(f"🏁 Done. {written} new rows appended to {self.output_csv} in {time.perf_counter() - started:.1f}s")
+        return written
+
+    def _join(self, threads):
+        # Stage threads are daemons: one stuck past JOIN_SECONDS (e.g. in a download) is left behind
+        for thread in threads:
+            thread.join(JOIN_SECONDS)
+            if thread.is_alive():
+                log.warning(f"⚠️ {thread.name} stage still busy after {JOIN_SECONDS}s; not waiting for it")
+
+    # === QUEUES ===
+    def _put(self, q, item):
+        # Blocks while q is full, like q.put, but gives up (returning False) once the run is aborted
+        while not self.aborted.is_set():
+            try:
+                q.put(item, timeout=QUEUE_POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q):
+        # Blocks until an item arrives, like q.get; an aborted run reads as the end of the stream
+        while not self.aborted.is_set():
+            try:
+                return q.get(timeout=QUEUE_POLL_SECONDS)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    # === STAGE 1: LISTING ===
+    def _list_stage(self):
+        try:
+            # Finish work a previous run left behind before starting on new invoices
+            self.manifest.adopt_files(self.download_dir, IMAGE_EXTENSIONS)
+            for invoice_id, path in self.manifest.pending_ocr():
+                if os.path.isfile(path):
+                    self._put(self.ocr_q, (invoice_id, path, self._find_original(invoice_id, path)))
+
+            metrics = get_metrics()
+            waited = time.perf_counter()
+            for record in self.records if self.records is not None else list_invoices():
+                if self.aborted.is_set():
+                    break
+                # Time spent waiting on the listing for this record (a page load, or its share of one request)
+                metrics.record(record.invoice_id, "list", time.perf_counter() - waited)
+                try:
+                    due_date = datetime.strptime(record.due_date, "%d-%m-%Y")
+                    self.manifest.mark_listed(record.invoice_id, record.due_date, record.url)
+
+                    if due_date > datetime.today():
+                        log.debug(f"⏩ Skipping {record.invoice_id} - due {record.due_date} (future)")
+                        metrics.count("skipped", stage="list", reason="future_due_date")
+                        continue
+                    if self.manifest.is_downloaded(record.invoice_id):
+                        metrics.count("skipped", stage="list", reason="already_downloaded")
+                        continue
+
+                    # Blocks while the downloaders are behind, which in turn slows the listing down
+                    self._put(self.download_q, (record.invoice_id, record.url))
+                except Exception as e:
+                    log.error(f"❌ Error processing {record.invoice_id}: {str(e)}")
+                    metrics.failure("list", type(e).__name__, record.invoice_id)
+                finally:
+                    waited = time.perf_counter()
+        except Exception as e:
+            log.error(f"❌ Error: {str(e)}")
+            get_metrics().failure("list", type(e).__name__)
+        finally:
+            for _ in range(self.download_workers):
+                self._put(self.download_q, _DONE)
+
+    # === STAGE 2: DOWNLOAD ===
+    def _download_stage(self):
+        while True:
+            item = self._get(self.download_q)
+            if item is _DONE:
+                self._put(self.ocr_q, _DONE)
+                return
+            invoice_id, url = item
+            file_path = self.downloader.download(invoice_id, url)
+            if file_path and self.manifest.mark_downloaded(invoice_id, file_path):
+                self._put(self.ocr_q, (invoice_id, file_path, self._find_original(invoice_id, file_path)))
+
+    def _find_original(self, invoice_id, path):
+        # Hashing happens here, on the download threads, so the OCR stage only looks the result up
+        if self.dedup is None:
+            return None
+        with get_metrics().span(invoice_id, "dedup") as span:
+            original = self.dedup.add(invoice_id, path)
+            if original:
+                span["duplicate_of"] = original
+        return original
+
+    # === STAGE 3: OCR ===
+    def _ocr_stage(self):
+        inflight, copies = self.inflight, self.copies
+        producers_left = self.download_workers
+        metrics = get_metrics()
+        try:
+            self.pool = self._new_pool()
+            if self.warm_workers:
+                start_workers(self.pool, self.ocr_workers)
+                log.info(f"🔥 {self.ocr_workers} OCR workers warm")
+            while producers_left or inflight or copies:
+                # Top the pool up while there is room and input waiting
+                while producers_left and len(inflight) < self.max_inflight:
+                    try:
+                        item = self.ocr_q.get(timeout=0.05 if inflight else None)
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        producers_left -= 1
+                        continue
+                    invoice_id, path, original = item
+                    if original:
+                        fields = self.dedup.fields(original)
+                        if fields:
+                            self._copy_done(invoice_id, path, fields, original)
+                            continue
+                        if self.is_queued(original) or original in (i for i, _ in inflight.values()):
+                            # Its original is still on its way through OCR
+                            copies.setdefault(original, []).append((invoice_id, path))
+                            continue
+                        # Its original failed, or is not part of this run: parking the copy would hold it
+                        # until the run ends, which for the watch daemon means until shutdown
+                    self._submit(invoice_id, path)
+
+                if not producers_left and not inflight and copies:
+                    # Originals that never came through this run (or failed): OCR the copies after all
+                    for invoice_id, path in (item for waiting in copies.values() for item in waiting):
+                        self._submit(invoice_id, path)
+                    copies.clear()
+                if not inflight:
+                    continue
+                done, _ = wait(inflight, timeout=0.05, return_when=FIRST_COMPLETED)
+                if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+                    self._recover_pool()
+                    continue
+                for future in done:
+                    invoice_id, path = inflight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        log.error(f"❌ Worker failed on {path}: {e}")
+                        result = None
+                    self._ocr_done(invoice_id, path, result)
+        except Exception as e:
+            # e.g. the pool could not start: stop the stages feeding this one, or they block on full
+            # queues forever. Invoices downloaded but not read are picked up by the next run
+            log.error(f"❌ OCR stage failed, stopping the run: {e}")
+            metrics.failure("ocr", type(e).__name__)
+            self.aborted.set()
+        finally:
+            if self.pool:
+                self.pool.shutdown(cancel_futures=True)
+            self.row_q.put(_DONE)
+
+    def _new_pool(self):
+        # Warm workers load their OCR engine as each process starts, including those of a pool rebuilt after a crash
+        return new_pool(self.ocr_workers, ocr_engine if self.warm_workers else None)
+
+    def _submit(self, invoice_id, path):
+        try:
+            future = self.pool.submit(extract_one, extract_invoice_timed, path)
+        except BrokenProcessPool:
+            # Broke since the last look at the futures in flight
+            self._recover_pool()
+            future = self.pool.submit(extract_one, extract_invoice_timed, path)
+        self.inflight[future] = (invoice_id, path)
+
+    def _recover_pool(self):
+        # A worker died (e.g. a decoder crash on one image) and broke the pool, failing everything in flight.
+        # Finished results still count; the rest are OCR'd again one at a time in a fresh process, so only
+        # the invoice that really crashes a worker fails (and is marked so), and the run goes on
+        finished, lost = [], []
+        for future, item in self.inflight.items():
+            broken = not future.done() or future.cancelled() or future.exception() is not None
+            (lost if broken else finished).append((item, future))
+        self.inflight.clear()
+        log.error(f"❌ An OCR worker died; re-running {len(lost)} invoices one by one")
+        self.pool.shutdown(cancel_futures=True)
+        self.pool = self._new_pool()
+        for (invoice_id, path), future in finished:
+            self._ocr_done(invoice_id, path, future.result())
+        results = extract_alone(extract_invoice_timed, [path for (_, path), _ in lost])
+        for ((invoice_id, path), _), result in zip(lost, results):
+            self._ocr_done(invoice_id, path, result)
+
+    def _ocr_done(self, invoice_id, path, result):
+        # Spans for the preprocess/OCR/parse time the worker measured
+        extracted_data = record_extraction(invoice_id, result)
+        duplicate_of = self.dedup.record_fields(invoice_id, extracted_data) if self.dedup else None
+        if duplicate_of:
+            get_metrics().count("duplicates", kind="near")
+        self.row_q.put((invoice_id, path, extracted_data, duplicate_of))
+        for copy_id, copy_path in self.copies.pop(invoice_id, []):
+            if extracted_data:
+                self._copy_done(copy_id, copy_path, extracted_data, invoice_id)
+            else:
+                # Its original failed: try the copies now rather than parking them until the run ends
+                self._submit(copy_id, copy_path)
+
+    def is_queued(self, invoice_id):
+        # Waiting in the OCR queue, not yet picked up
+        with self.ocr_q.mutex:
+            return any(item is not _DONE and item[0] == invoice_id for item in self.ocr_q.queue)
+
+    def _copy_done(self, invoice_id, path, fields, original):
+        # Same bytes as an invoice already read: reuse its fields and flag the row
+        self.dedup.record_fields(invoice_id, fields)
+        get_metrics().count("duplicates", kind="exact")
+        self.row_q.put((invoice_id, path, fields, original))
+
+    # === STAGE 4: OUTPUT ===
+    def _write_stage(self, started):
+        metrics = get_metrics()
+        self.validator = validator = RowValidator(rejects_path(self.output_csv))
+        # Rows are appended across runs, so invoice numbers written before are already taken
+        validator.claim(self.manifest.emitted_fields())
+
+        def flushed(rows):
+            # Only rows that reached every sink count as emitted, so a crash mid-batch re-emits them next run
+            self.manifest.mark_emitted([row[0] for row in rows])
+            metrics.record(None, "write", writer.last_flush_seconds, rows=len(rows))
+            if writer.written == len(rows):
+                log.info(f"⏱️ First rows written after {time.perf_counter() - started:.1f}s")
+
+        with BatchWriter(open_sinks(self.output_csv, self.output_formats), batch_size=self.batch_size,
+                         on_flush=flushed, prepare=validator) as writer:
+
+            # Rows extracted on an earlier run but never written (e.g. crashed, or rejected then)
+            writer.extend(self.manifest.pending_emit())
+
+            while True:
+                try:
+                    # Wake up now and then so a trickle of rows still gets written out promptly
+                    item = self.row_q.get(timeout=FLUSH_SECONDS)
+                except queue.Empty:
+                    item = None
+                if writer.due():
+                    writer.flush()
+                if item is None:
+                    continue
+                if item is _DONE:
+                    break
+                invoice_id, path, extracted_data, duplicate_of = item
+                self.manifest.mark_ocrd(invoice_id, extracted_data, duplicate_of)
+                if not extracted_data:
+                    log.error(f"❌ Failed to extract data from {os.path.basename(path)}")
+                    continue
+                writer.add((invoice_id, self.manifest.due_date(invoice_id), extracted_data, duplicate_of))
+
+        if validator.rejected:
+            log.warning(f"🚫 {validator.rejected} rows rejected, with reasons, in {validator.rejects_csv}")
+        return writer.written
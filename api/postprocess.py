@@ -0,0 +1,203 @@
+import os
+import re
+import csv
+import logging
+from decimal import Decimal
+from functools import lru_cache
+from datetime import datetime, timedelta
+from metrics import get_metrics
+from sinks import CSV_HEADER, ROW_DATE_FORMAT
+
+# === CONFIG ===
+INVOICE_DATE_FORMAT = "%b %d, %Y"  # How the field extractor hands over invoice dates
+AMOUNT_RANGE = (Decimal("0.01"), Decimal("1000000.00"))  # Totals outside this are rejected as misreads
+UNIQUE_KEY = ("InvoiceNo",)  # Columns no two accepted invoices may share (rows flagged DuplicateOf aside)
+REJECTS_SUFFIX = "_rejects.csv"  # Rejected rows and their reasons, next to the output CSV
+# Batches smaller than this are checked row by row: a pandas pass costs ~10ms before it touches a row and
+# only overtakes the row loop at about this size (see benchmarks/bench_postprocess.py)
+VECTORIZE_MIN_ROWS = 20000
+FIELD_COLUMNS = ["InvoiceNo", "RawInvoiceDate", "CompanyName", "RawTotalDue"]  # The extracted fields tuple
+REJECT_COLUMNS = ["ID", "DueDate", "InvoiceNo", "InvoiceDate", "CompanyName", "TotalDue", "DuplicateOf", "Reasons"]
+# Every rule, in the order reasons are listed
+CHECKS = ("missing_invoice_no", "bad_invoice_date", "future_invoice_date", "bad_amount", "amount_out_of_range",
+          "duplicate_invoice_no")
+
+AMOUNT_NOISE = re.compile(r"[$,\s]")
+AMOUNT = re.compile(r"-?\d{1,15}(?:\.\d+)?")  # What is left of a readable total once the noise is gone
+CENT = Decimal("0.01")
+
+log = logging.getLogger(__name__)
+
+@lru_cache(maxsize=4096)
+def parse_invoice_date(value):
+    # Invoices of a run share a few hundred dates at most, so each string is parsed about once
+    try:
+        return datetime.strptime(value, INVOICE_DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+def parse_amount(value):
+    # "$17,468.03" -> Decimal("17468.03"), exact to the cent (a float would round some cents wrong); None when
+    # it is not a plain number
+    value = AMOUNT_NOISE.sub("", value) if isinstance(value, str) else ""
+    return Decimal(value).quantize(CENT) if AMOUNT.fullmatch(value) else None
+
+def rejects_path(output_csv):
+    return f"{os.path.splitext(output_csv)[0]}{REJECTS_SUFFIX}"
+
+class RowValidator:
+    """Turns batches of extracted invoices into output rows.
+
+    Takes (invoice_id, due date or None, (invoice_number, invoice_date, company_name, total_due),
+    duplicate_of) records; joins in due dates, reformats invoice dates, normalizes amounts and applies
+    the validation rules. Rows failing any rule go to the rejects file with every reason they failed;
+    the rest come back as CSV_HEADER rows. Invoice numbers stay claimed across batches for the whole run.
+    Large batches (a whole extract run, a resumed backlog) are checked a column at a time with pandas,
+    the trickle from a streaming run row by row; both apply the same rules.
+    """
+
+    def __init__(self, rejects_csv, due_dates=None, default_due_date="Unknown", today=None,
+                 vectorize_min_rows=VECTORIZE_MIN_ROWS):
+        self.rejects_csv = rejects_csv
+        self.due_dates = due_dates or {}
+        self.default_due_date = default_due_date
+        self.today = today or datetime.today().date()
+        self.vectorize_min_rows = vectorize_min_rows
+        self.seen = set()  # UNIQUE_KEY values of rows accepted so far
+        self.rejected = 0
+        self.reasons = {}  # invoice_id -> why its latest row was rejected
+        # One rejects file per run: rows rejected now are retried (and re-rejected or accepted) next run
+        if os.path.exists(rejects_csv):
+            os.remove(rejects_csv)
+
+    def claim(self, fields):
+        """Mark the invoice numbers of already written invoices (e.g. earlier runs) as taken."""
+        for values in fields:
+            self.seen.add(self._key(dict(zip(FIELD_COLUMNS, values))))
+
+    @staticmethod
+    def _key(row):
+        return "|".join("" if row[column] is None else str(row[column]).strip() for column in UNIQUE_KEY)
+
+    def __call__(self, records):
+        return self.process(records)
+
+    def process(self, records):
+        if not records:
+            return []
+        if len(records) >= self.vectorize_min_rows:
+            rows, rejects = self._check_frame(records)
+        else:
+            rows, rejects = self._check_rows(records)
+        if self.reasons:
+            for row in rows:
+                self.reasons.pop(row[0], None)
+        if rejects:
+            self._reject(rejects)
+        return rows
+
+    # === ROW BY ROW ===
+    def _check_rows(self, records):
+        rows, rejects = [], []
+        for invoice_id, due_date, fields, duplicate_of in records:
+            invoice_no, raw_date, company_name, raw_total = fields
+            invoice_no = "" if invoice_no is None else str(invoice_no).strip()
+            if due_date is None:
+                due_date = self.due_dates.get(invoice_id, self.default_due_date)
+            invoice_date = parse_invoice_date(raw_date)
+            amount = parse_amount(raw_total)
+
+            failed = [check for check, failing in (
+                ("missing_invoice_no", not invoice_no),
+                ("bad_invoice_date", invoice_date is None),
+                ("future_invoice_date", invoice_date is not None and invoice_date.date() > self.today),
+                ("bad_amount", amount is None),
+                ("amount_out_of_range", amount is not None and not AMOUNT_RANGE[0] <= amount <= AMOUNT_RANGE[1]),
+            ) if failing]
+            key = self._key(dict(zip(FIELD_COLUMNS, fields), ID=invoice_id, InvoiceNo=invoice_no))
+            if not failed and not duplicate_of and key in self.seen:
+                failed.append("duplicate_invoice_no")
+            if failed:
+                rejects.append(([invoice_id, due_date, invoice_no, raw_date, company_name, raw_total,
+                                 duplicate_of or ""], failed))
+                continue
+            self.seen.add(key)
+            rows.append([invoice_id, due_date, invoice_no, invoice_date.strftime(ROW_DATE_FORMAT), company_name,
+                         str(amount), duplicate_of or ""])
+        return rows, rejects
+
+    # === A COLUMN AT A TIME ===
+    def _check_frame(self, records):
+        import pandas as pd
+
+        invoice_ids, due_dates, fields, duplicate_of = zip(*records)
+        df = pd.DataFrame(dict(zip(FIELD_COLUMNS, zip(*fields))), dtype="object")
+        df.insert(0, "ID", invoice_ids)
+        df["DuplicateOf"] = pd.Series(duplicate_of, dtype="object").fillna("")
+
+        # Due dates: the record's own (from the listing), else the joined mapping, else the placeholder
+        df["DueDate"] = (pd.Series(due_dates, dtype="object")
+                         .fillna(df["ID"].map(self.due_dates))
+                         .fillna(self.default_due_date))
+
+        # Parse each distinct date string once and join the result back on
+        distinct_dates = df["RawInvoiceDate"].dropna().unique()
+        dates = df["RawInvoiceDate"].map(pd.Series(
+            pd.to_datetime(distinct_dates, format=INVOICE_DATE_FORMAT, errors="coerce"), index=distinct_dates))
+        # The same as parse_amount, with only the Decimals themselves made one by one
+        totals = df["RawTotalDue"].astype("string").str.replace(AMOUNT_NOISE.pattern, "", regex=True)
+        readable = totals.str.fullmatch(AMOUNT.pattern).fillna(False).astype(bool)
+        amounts = pd.Series(None, index=df.index, dtype="object")
+        amounts[readable] = [Decimal(total).quantize(CENT) for total in totals[readable]]
+        # Unreadable totals stand in as the lower bound, so every comparison is between Decimals
+        in_range = amounts.where(readable, AMOUNT_RANGE[0]).between(*AMOUNT_RANGE)
+        df["InvoiceNo"] = df["InvoiceNo"].fillna("").astype(str).str.strip()
+
+        checks = pd.DataFrame({
+            "missing_invoice_no": df["InvoiceNo"].eq(""),
+            "bad_invoice_date": dates.isna(),
+            "future_invoice_date": dates >= pd.Timestamp(self.today + timedelta(days=1)),
+            "bad_amount": ~readable,
+            "amount_out_of_range": readable & ~in_range,
+        })
+        # Only rows that pass every other rule claim an invoice number: a row rejected for its amount must not
+        # make a later, valid one look like a duplicate. Flagged copies claim it too, but are never rejected for it
+        eligible = ~checks.any(axis=1)
+        key_columns = [df[column].fillna("").astype(str).str.strip() for column in UNIQUE_KEY]
+        keys = key_columns[0].str.cat(key_columns[1:], sep="|") if len(key_columns) > 1 else key_columns[0]
+        checks["duplicate_invoice_no"] = (eligible & df["DuplicateOf"].eq("")
+                                          & (keys.isin(self.seen) | keys.where(eligible).duplicated()))
+        rejected = checks.any(axis=1)
+        self.seen.update(keys[~rejected].tolist())
+
+        # Likewise formatted once per distinct date
+        codes, distinct = pd.factorize(dates[~rejected])
+        accepted = df[~rejected].assign(
+            InvoiceDate=distinct.strftime(ROW_DATE_FORMAT).to_numpy()[codes],
+            TotalDue=amounts[~rejected].astype(str),
+        )
+        rows = accepted[CSV_HEADER].values.tolist()
+        failed = df[rejected]
+        reasons = checks[rejected].astype(int).dot(checks.columns + ";").str.rstrip(";").str.split(";")
+        rejects = list(zip(failed[["ID", "DueDate", "InvoiceNo", "RawInvoiceDate", "CompanyName", "RawTotalDue",
+                                   "DuplicateOf"]].values.tolist(), reasons))
+        return rows, rejects
+
+    # === REJECTS ===
+    def _reject(self, rejects):
+        write_header = not os.path.exists(self.rejects_csv)
+        with open(self.rejects_csv, "a", newline="") as f:
+            writer = csv.writer(f)
+            if write_header:
+                writer.writerow(REJECT_COLUMNS)
+            writer.writerows(row + [";".join(reasons)] for row, reasons in rejects)
+        self.rejected += len(rejects)
+        self.reasons.update((row[0], ";".join(reasons)) for row, reasons in rejects)
+
+        counts = {check: sum(check in reasons for _, reasons in rejects) for check in CHECKS}
+        metrics = get_metrics()
+        for reason, count in counts.items():
+            if count:
+                metrics.count("rejected", count, stage="output", reason=reason)
+        log.warning(f"🚫 {len(rejects)} rows rejected ({', '.join(f'{r}: {c}' for r, c in counts.items() if c)}); "
+                    f"see {self.rejects_csv}")
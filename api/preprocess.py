@@ -0,0 +1,146 @@
+import os
+import sys
+import time
+
+# === CONFIG ===
+PREPROCESS = {
+    "grayscale": True,  # Tesseract only looks at luminance anyway
+    "binarize": True,  # Black text on white; threshold picked per image (Otsu) unless set below
+    "threshold": None,
+    "target_dpi": 300,  # Shrink scans declared above this DPI; tesseract is tuned for ~300
+    "max_side": 2500,  # Downscale anything larger; OCR time grows with pixel count
+    "roi": True,  # OCR only the layout's field regions when the page matches a known layout
+}
+
+# Known invoice layouts: matched on page aspect ratio (width / height), then cropped to the
+# regions that hold our four fields, as (left, top, right, bottom) fractions of the page:
+# the header block (vendor, invoice number, date) and the totals block. Pages that match no
+# layout, or whose crops miss a field, are read in full.
+LAYOUTS = [
+    {"name": "portrait", "aspect": 0.77, "regions": [(0.0, 0.0, 1.0, 0.35), (0.0, 0.55, 1.0, 0.9)]},
+    {"name": "landscape", "aspect": 1.41, "regions": [(0.0, 0.0, 1.0, 0.4), (0.0, 0.55, 1.0, 0.95)]},
+]
+ASPECT_TOLERANCE = 0.08
+
+def config_key(config=PREPROCESS):
+    # Stable text form of the config, so cached OCR results are only reused for identical preprocessing
+    return ",".join(f"{k}={config[k]}" for k in sorted(config))
+
+# === STAGES ===
+def to_grayscale(image):
+    return image if image.mode == "L" else image.convert("L")
+
+def otsu_threshold(image):
+    histogram = image.histogram()[:256]
+    total = sum(histogram)
+    sum_all = sum(i * count for i, count in enumerate(histogram))
+    sum_bg, weight_bg, best, threshold = 0, 0, 0.0, 127
+    for level, count in enumerate(histogram):
+        weight_bg += count
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += level * count
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, level
+    return threshold
+
+def binarize(image, threshold=None):
+    image = to_grayscale(image)
+    threshold = otsu_threshold(image) if threshold is None else threshold
+    return image.point(lambda p: 255 if p > threshold else 0)
+
+def normalize_scale(image, target_dpi, max_side):
+    # Bring high-DPI scans down to the target DPI, then cap the longest side. Never upscale here:
+    # many web images declare 72 DPI without meaning it, and extra pixels only make OCR slower
+    scale = 1.0
+    dpi = image.info.get("dpi")
+    if target_dpi and dpi and dpi[0]:
+        scale = min(1.0, target_dpi / float(dpi[0]))
+    longest = max(image.size) * scale
+    if max_side and longest > max_side:
+        scale *= max_side / longest
+    if abs(scale - 1.0) < 0.02:
+        return image
+    from PIL import Image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.LANCZOS)
+
+def match_layout(image, layouts=LAYOUTS):
+    aspect = image.width / image.height
+    for layout in layouts:
+        if abs(aspect - layout["aspect"]) <= ASPECT_TOLERANCE:
+            return layout
+    return None
+
+def crop_regions(image, layout):
+    width, height = image.size
+    return [image.crop((round(l * width), round(t * height), round(r * width), round(b * height)))
+            for l, t, r, b in layout["regions"]]
+
+# === PIPELINE ===
+def preprocess(image, config=PREPROCESS):
+    """Return (images to OCR, per-stage seconds); a single full page unless a layout matched."""
+    timings = {}
+
+    def timed(stage, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings[stage] = time.perf_counter() - started
+        return result
+
+    # Resize first: every later stage then works on fewer pixels
+    image = timed("scale", normalize_scale, image, config["target_dpi"], config["max_side"])
+    if config["grayscale"]:
+        image = timed("grayscale", to_grayscale, image)
+    if config["binarize"]:
+        image = timed("binarize", binarize, image, config["threshold"])
+
+    layout = match_layout(image) if config["roi"] else None
+    images = timed("roi", crop_regions, image, layout) if layout else [image]
+    return images, timings
+
+def report_timings(timings, count=None):
+    for stage, seconds in timings.items():
+        per_image = f" ({seconds / count * 1000:.1f} ms/image)" if count else ""
+        print(f"⏱️ {stage:<10} {seconds:.3f}s{per_image}")
+
+# === STANDALONE TIMING RUN ===
+if __name__ == "__main__":
+    # python preprocess.py [invoices_dir] [--ocr]: time each stage over a folder; --ocr also times
+    # tesseract on the raw page against the preprocessed input
+    from PIL import Image
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    with_ocr = "--ocr" in sys.argv
+    folder = args[0] if args else "invoices"
+    files = sorted(f for f in os.listdir(folder) if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+    pixels_in = pixels_out = 0
+    stage_timings = {}
+    ocr_timings = {"ocr_raw": 0.0, "ocr_preprocessed": 0.0}
+    if with_ocr:
+        from ocr_backends import get_backend
+        engine = get_backend()
+    for filename in files:
+        with Image.open(os.path.join(folder, filename)) as image:
+            pixels_in += image.width * image.height
+            images, timings = preprocess(image)
+            for stage, seconds in timings.items():
+                stage_timings[stage] = stage_timings.get(stage, 0.0) + seconds
+            pixels_out += sum(i.width * i.height for i in images)
+            if with_ocr:
+                started = time.perf_counter()
+                engine.image_to_string(image)
+                ocr_timings["ocr_raw"] += time.perf_counter() - started
+                started = time.perf_counter()
+                for region in images:
+                    engine.image_to_string(region)
+                ocr_timings["ocr_preprocessed"] += time.perf_counter() - started
+    print(f"🖼️ {len(files)} images, {pixels_in:,} → {pixels_out:,} pixels sent to OCR")
+    report_timings(stage_timings, count=len(files))
+    if with_ocr:
+        report_timings(ocr_timings, count=len(files))
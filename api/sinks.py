@@ -0,0 +1,277 @@
+import os
+import csv
+import time
+import sqlite3
+import logging
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+# === CONFIG ===
+OUTPUT_FORMATS = ("csv",)  # Any of "csv", "parquet" (needs pyarrow), "sqlite"
+BATCH_SIZE = 50  # Rows buffered before they are written out
+FLUSH_SECONDS = 2.0  # ...or this long after the oldest buffered row, whichever comes first
+# DuplicateOf: the earlier invoice this one is a copy or re-issued scan of (see dedup.py), else empty
+CSV_HEADER = ["ID", "DueDate", "InvoiceNo", "InvoiceDate", "CompanyName", "TotalDue", "DuplicateOf"]
+ROW_DATE_FORMAT = "%d-%m-%Y"  # How dates appear in CSV rows
+
+log = logging.getLogger(__name__)
+
+# === TYPED VALUES ===
+def parse_date(value):
+    try:
+        return datetime.strptime(value, ROW_DATE_FORMAT).date()
+    except (TypeError, ValueError):
+        return None  # e.g. "Unknown" when the listing never gave a due date
+
+def parse_amount(value):
+    try:
+        return Decimal(str(value).replace(",", "").replace("$", "").strip()).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        return None
+
+def typed_row(row):
+    # CSV row -> (ID, DueDate, InvoiceNo, InvoiceDate, CompanyName, TotalDue, DuplicateOf) with real dates and amounts
+    invoice_id, due_date, invoice_no, invoice_date, company_name, total_due, duplicate_of = row
+    return (invoice_id, parse_date(due_date), invoice_no, parse_date(invoice_date), company_name,
+            parse_amount(total_due), duplicate_of or None)
+
+# === SINKS ===
+def migrate_csv(path, old_width):
+    # Rewritten next to the original and swapped in, so a crash mid-way leaves the old file intact
+    tmp_path = f"{path}.migrating"
+    with open(path, newline="") as src, open(tmp_path, "w", newline="") as dst:
+        reader, writer = csv.reader(src), csv.writer(dst)
+        next(reader)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(row + [""] * (len(CSV_HEADER) - len(row)) for row in reader)
+    os.replace(tmp_path, path)
+    log.info(f"🔁 Migrated {path} from {old_width} to {len(CSV_HEADER)} columns ({', '.join(CSV_HEADER[old_width:])} added)")
+
+class CsvSink:
+    """Appends rows to a CSV file (header written once), or rewrites it when append=False.
+
+    A file written before columns were added at the end (e.g. DuplicateOf) is migrated first: new header,
+    old rows padded with empty values. Any other header is refused rather than appended to.
+    """
+
+    name = "csv"
+
+    def __init__(self, path, append=True):
+        self.path = path
+        write_header = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        if not write_header:
+            with open(path, newline="") as f:
+                header = next(csv.reader(f), None)
+            if header != CSV_HEADER:
+                if not header or header != CSV_HEADER[:len(header)]:
+                    raise RuntimeError(f"{path} has columns {header}, not {CSV_HEADER}; move it aside to start a new file")
+                migrate_csv(path, len(header))
+        self.file = open(path, "a" if append else "w", newline="")
+        self.writer = csv.writer(self.file)
+        if write_header:
+            self.writer.writerow(CSV_HEADER)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class ParquetSink:
+    """Writes typed rows to Parquet, one closed part file per batch.
+
+    Parquet files cannot be appended to, and one is unreadable until its footer is written on close,
+    so every batch becomes its own complete file inside the `<name>.parquet` directory, written
+    under a hidden name and renamed into place. pandas/pyarrow read the directory back as one table,
+    and rows count as written (and emitted) only once their part is readable, even if the run is
+    killed later. With append=False the earlier parts are deleted before this run's first part
+    lands, so the directory reads back as this run's rows only.
+    """
+
+    name = "parquet"
+
+    def __init__(self, path, append=True):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)") from e
+        self.pa = pa
+        self.pq = pq
+        self.schema = pa.schema([
+            ("ID", pa.string()),
+            ("DueDate", pa.date32()),
+            ("InvoiceNo", pa.string()),
+            ("InvoiceDate", pa.date32()),
+            ("CompanyName", pa.string()),
+            ("TotalDue", pa.decimal128(14, 2)),
+            ("DuplicateOf", pa.string()),
+        ])
+        os.makedirs(path, exist_ok=True)
+        self.dir = path
+        self.replaces = [] if append else [os.path.join(path, name) for name in os.listdir(path)
+                                            if name.startswith("part-") and name.endswith(".parquet")]
+        self.prefix = f"part-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.parts = 0
+
+    def _drop_replaced(self):
+        for old_part in self.replaces:
+            os.remove(old_part)
+        self.replaces = []
+
+    def write_rows(self, rows):
+        columns = list(zip(*(typed_row(row) for row in rows)))
+        table = self.pa.Table.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema,
+        )
+        self.parts += 1
+        name = f"{self.prefix}-{self.parts:05d}.parquet"
+        # Readers skip dot files, so a half-written part is never picked up
+        tmp_path = os.path.join(self.dir, f".{name}")
+        self.pq.write_table(table, tmp_path, compression="zstd")
+        self._drop_replaced()
+        os.replace(tmp_path, os.path.join(self.dir, name))
+
+    def close(self):
+        # A rewrite that wrote nothing still leaves an empty directory
+        self._drop_replaced()
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    ID TEXT PRIMARY KEY,
+    DueDate TEXT,
+    InvoiceNo TEXT,
+    InvoiceDate TEXT,
+    CompanyName TEXT,
+    TotalDue REAL,
+    DuplicateOf TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_invoices_invoice_no ON invoices (InvoiceNo);
+"""
+
+class SqliteSink:
+    """Upserts rows into an `invoices` table keyed on ID and indexed on InvoiceNo; dates are stored as ISO text."""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SQLITE_SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(invoices)")}
+        if "DuplicateOf" not in columns:
+            # Databases written before duplicate detection
+            self.conn.execute("ALTER TABLE invoices ADD COLUMN DuplicateOf TEXT")
+
+    def write_rows(self, rows):
+        now = time.time()
+        params = []
+        for row in rows:
+            invoice_id, due_date, invoice_no, invoice_date, company_name, total_due, duplicate_of = typed_row(row)
+            params.append((invoice_id, due_date and due_date.isoformat(), invoice_no,
+                           invoice_date and invoice_date.isoformat(), company_name,
+                           None if total_due is None else float(total_due), duplicate_of, now))
+        # A re-extracted invoice replaces its earlier row instead of duplicating it
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                """INSERT INTO invoices (ID, DueDate, InvoiceNo, InvoiceDate, CompanyName, TotalDue, DuplicateOf,
+                   updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (ID) DO UPDATE SET DueDate = excluded.DueDate, InvoiceNo = excluded.InvoiceNo,
+                   InvoiceDate = excluded.InvoiceDate, CompanyName = excluded.CompanyName,
+                   TotalDue = excluded.TotalDue, DuplicateOf = excluded.DuplicateOf,
+                   updated_at = excluded.updated_at""",
+                params,
+            )
+
+    def close(self):
+        self.conn.close()
+
+def open_sinks(output_csv, formats=OUTPUT_FORMATS, append=True):
+    # Every format is written next to the CSV under the same base name
+    base = os.path.splitext(output_csv)[0]
+    sinks = []
+    for output_format in formats:
+        if output_format == "csv":
+            sinks.append(CsvSink(output_csv, append=append))
+        elif output_format == "parquet":
+            sinks.append(ParquetSink(f"{base}.parquet", append=append))
+        elif output_format == "sqlite":
+            sinks.append(SqliteSink(f"{base}.sqlite"))
+        else:
+            raise ValueError(f"Unknown output format: {output_format}")
+    return sinks
+
+# === BATCHING ===
+class BatchWriter:
+    """Buffers finished rows and writes them to every sink in batches.
+
+    prepare(records) turns a buffered batch into the rows to write (see postprocess.RowValidator), dropping
+    any it rejects; without it the buffered items are the rows. on_flush(rows) runs after each batch is
+    written everywhere, e.g. to mark those invoices as emitted.
+    """
+
+    def __init__(self, sinks, batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS, on_flush=None, prepare=None):
+        self.sinks = sinks
+        self.prepare = prepare
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.on_flush = on_flush
+        self.rows = []
+        self.oldest = None
+        self.written = 0
+        self.last_flush_seconds = 0.0
+
+    def add(self, row):
+        if not self.rows:
+            self.oldest = time.monotonic()
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def extend(self, rows):
+        # Many rows at once (e.g. a resumed backlog) go through prepare as one batch, however large
+        rows = list(rows)
+        if not rows:
+            return
+        if not self.rows:
+            self.oldest = time.monotonic()
+        self.rows.extend(rows)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def due(self):
+        return bool(self.rows) and time.monotonic() - self.oldest >= self.flush_seconds
+
+    def flush(self):
+        if not self.rows:
+            return
+        rows, self.rows = self.rows, []
+        started = time.perf_counter()
+        if self.prepare:
+            rows = self.prepare(rows)
+            if not rows:
+                return
+        for sink in self.sinks:
+            sink.write_rows(rows)
+        self.last_flush_seconds = time.perf_counter() - started
+        self.written += len(rows)
+        if self.on_flush:
+            self.on_flush(rows)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            for sink in self.sinks:
+                sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,13 @@
+import os
+import sys
+import pytest
+
+# The pipeline modules import each other by name from api/, as when run from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    # Caches, manifests and run reports land in the working directory; each test starts a fresh run
+    import metrics
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(metrics, "_metrics", {})
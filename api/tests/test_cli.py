@@ -0,0 +1,37 @@
+import os
+import csv
+import time
+import cli
+import extract
+import listing
+import pipeline
+from manifest import RunManifest
+
+def fake_extract(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return (name.upper(), "Jan 01, 2020", "Acme LLC", "$1.00"), {"started": time.time()}
+
+def test_download_extract_run_writes_each_invoice_once(monkeypatch):
+    # `download`, as far as the manifest and folder go
+    os.makedirs("invoices")
+    manifest = RunManifest("manifest.sqlite")
+    for i in range(3):
+        path = os.path.join("invoices", f"inv{i}.png")
+        with open(path, "wb") as f:
+            f.write(f"inv{i}".encode())
+        manifest.mark_listed(f"inv{i}", "01-01-2020", f"http://portal/{i}")
+        manifest.mark_downloaded(f"inv{i}", path)
+    manifest.close()
+
+    monkeypatch.setattr(extract, "extract_invoice_timed", fake_extract)
+    monkeypatch.setattr(pipeline, "extract_invoice_timed", fake_extract)
+    monkeypatch.setattr(listing, "list_invoices", lambda base_url: iter(()))
+    common = ["--manifest", "manifest.sqlite", "--output", "out.csv", "--formats", "csv"]
+    cli.main(["extract", *common])
+    cli.main(["run", *common])
+
+    with open("out.csv", newline="") as f:
+        ids = [row[0] for row in csv.reader(f)][1:]
+    assert sorted(ids) == ["inv0", "inv1", "inv2"]
+    manifest = RunManifest("manifest.sqlite")
+    assert {manifest.status(f"inv{i}")["state"] for i in range(3)} == {"emitted"}
@@ -0,0 +1,73 @@
+import os
+import stat
+import pytest
+import downloader
+from downloader import InvoiceDownloader
+from metrics import NEW_FILE_MODE
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", content_type="image/png"):
+        self.status_code = status_code
+        self.body = body
+        self.headers = {"content-type": content_type}
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+class FakeSession:
+    """Answers each GET with the next response in line."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = 0
+
+    def get(self, url, stream, timeout):
+        self.requests += 1
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def invoices_dir(tmp_path):
+    return tmp_path / "invoices"
+
+@pytest.fixture
+def download(invoices_dir):
+    def download(*responses):
+        with InvoiceDownloader(str(invoices_dir), max_workers=1, retries=2, backoff=0) as d:
+            d.session = FakeSession(responses)
+            return d.download("inv1", "http://portal/inv1"), d.session.requests
+    return download
+
+def test_server_errors_are_retried(download):
+    path, requests = download(FakeResponse(503), FakeResponse(502), FakeResponse(200, b"png bytes"))
+    assert requests == 3
+    assert open(path, "rb").read() == b"png bytes" and path.endswith("inv1.png")
+
+def test_retries_run_out(download):
+    path, requests = download(*[FakeResponse(500)] * 3)
+    assert (path, requests) == (None, 3)
+
+def test_client_errors_are_not_retried(download):
+    path, requests = download(FakeResponse(404), FakeResponse(200, b"never asked for"))
+    assert (path, requests) == (None, 1)
+
+def test_written_file_is_complete_with_the_usual_mode(download, invoices_dir):
+    path, _ = download(FakeResponse(200, b"x" * 200_000))
+    assert os.path.getsize(path) == 200_000
+    assert stat.S_IMODE(os.stat(path).st_mode) == NEW_FILE_MODE
+    assert os.listdir(invoices_dir) == ["inv1.png"]  # No temp file left behind
+
+def test_oversized_download_leaves_nothing(download, invoices_dir, monkeypatch):
+    monkeypatch.setattr(downloader, "MAX_DOWNLOAD_BYTES", 100_000)
+    path, _ = download(FakeResponse(200, b"x" * 200_000))
+    assert path is None
+    assert os.listdir(invoices_dir) == []
@@ -0,0 +1,46 @@
+import os
+import json
+import time
+import extract
+from extract import record_extraction
+from metrics import get_metrics
+from postprocess import RowValidator
+from sinks import BATCH_SIZE
+
+def test_preprocess_stages_are_recorded_as_spans():
+    timings = {"started": 100.0, "decode": 0.1, "preprocess": 0.4, "ocr": 1.0, "cache": "miss",
+               "preprocess_stages": {"scale": 0.1, "grayscale": 0.05, "binarize": 0.2, "roi": 0.05}}
+    metrics = get_metrics()
+    record_extraction("inv1", (("1", "Jan 01, 2020", "Acme", "$1.00"), timings))
+    metrics.finish()
+
+    with open(metrics.report_path, encoding="utf-8") as f:
+        spans = {event["stage"]: event for event in map(json.loads, f) if event["type"] == "span"}
+    assert list(spans) == ["decode", "preprocess", "preprocess.scale", "preprocess.grayscale",
+                           "preprocess.binarize", "preprocess.roi", "ocr"]
+    # Laid end to end inside the preprocess span
+    assert spans["preprocess.scale"]["start"] == spans["preprocess"]["start"] == 100.1
+    assert spans["preprocess.roi"]["start"] == 100.45
+    assert spans["ocr"]["start"] == 100.5
+
+def fake_extract(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return (name.upper(), "Jan 01, 2020", "Acme LLC", "$1.00"), {"started": time.time()}
+
+def test_extract_validates_the_run_as_one_batch(monkeypatch):
+    # Large enough for the column-at-a-time checks only if the run is not cut into BATCH_SIZE pieces
+    batches = []
+
+    class RecordingValidator(RowValidator):
+        def process(self, records):
+            batches.append(len(records))
+            return super().process(records)
+
+    os.makedirs("invoices")
+    for i in range(BATCH_SIZE + 10):
+        with open(os.path.join("invoices", f"inv{i}.png"), "wb") as f:
+            f.write(f"inv{i}".encode())
+    monkeypatch.setattr(extract, "RowValidator", RecordingValidator)
+    monkeypatch.setattr(extract, "extract_invoice_timed", fake_extract)
+    extract.process_invoices("invoices", "out.csv", ("csv",))
+    assert batches == [BATCH_SIZE + 10]
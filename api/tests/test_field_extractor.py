@@ -0,0 +1,43 @@
+import os
+import json
+import pytest
+from field_extractor import FieldExtractor, extract_fields, literal_hint, FIELDS
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+
+with open(os.path.join(FIXTURES_DIR, "expected.json"), encoding="utf-8") as f:
+    EXPECTED = json.load(f)
+
+@pytest.mark.parametrize("filename", sorted(EXPECTED))
+def test_fixtures(filename):
+    with open(os.path.join(FIXTURES_DIR, "ocr_text", filename), encoding="utf-8") as f:
+        fields = extract_fields(f.read())
+    found = tuple(fields[field].value for field in FIELDS) if all(field in fields for field in FIELDS) else None
+    assert found == (tuple(EXPECTED[filename]) if EXPECTED[filename] else None)
+
+def test_overlapping_rules_all_match():
+    # The second rule reads text inside the first one's match
+    extractor = FieldExtractor([{"name": "t", "rules": [
+        {"pattern": r"^(?P<company_name>\w+ LLC) (?P<total_due>\$\d+\.\d{2})", "confidence": 0.9},
+        {"pattern": r"(?P<invoice_number>\d+)\.", "confidence": 0.5},
+    ]}])
+    fields = extractor.extract("Acme LLC $10.00")
+    assert {field: (match.value, match.rule) for field, match in fields.items()} == {
+        "company_name": ("Acme LLC", 0), "total_due": ("$10.00", 0), "invoice_number": ("10", 1)}
+
+def test_rules_matching_at_the_same_offset_all_count():
+    # Both default rules start at the line's first character
+    fields = extract_fields("#10021 Acme LLC")
+    assert {field: (match.value, match.rule) for field, match in fields.items()} == {
+        "invoice_number": ("10021 Acme LLC", 2), "company_name": ("#10021 Acme LLC", 5)}
+
+@pytest.mark.parametrize("pattern, hint", [
+    (r"Sit\s+Amet\s+Corp", "Amet"),
+    (r"Vendor001\s+Ltd", "Vendor001"),
+    (r"Acmes?", "Acme"),  # The optional "s" is not part of it
+    (r"\sAcme", None),  # Nor is an escape's letter
+    (r"(?i)acme", None),
+    (r"Acme|Apex", None),
+])
+def test_literal_hint(pattern, hint):
+    assert literal_hint(pattern) == hint
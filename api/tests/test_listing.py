@@ -0,0 +1,42 @@
+import threading
+from listing import ScrapeScheduler, InvoiceRecord
+
+class FakePool:
+    size = 4
+
+    def close(self):
+        pass
+
+class FakeScheduler(ScrapeScheduler):
+    # Portals of 25 pages, one record per page; "slow" blocks until "fast" has been read in full
+    def __init__(self, fail=()):
+        super().__init__(FakePool(), pages_per_task=10)
+        self.fail = fail
+        self.fast_read = threading.Event()
+
+    def _scrape_range(self, base_url, first_page, last_page):
+        if base_url == "slow":
+            assert self.fast_read.wait(5)
+        if (base_url, first_page) in self.fail:
+            raise RuntimeError("table never drew")
+        last_page = min(last_page, 25)
+        return 25, {page: [InvoiceRecord(f"{base_url}-{page}", "01-01-2020", "")]
+                    for page in range(first_page, last_page + 1)}
+
+def test_ranges_are_yielded_as_they_finish():
+    scheduler = FakeScheduler()
+    seen = []
+    for portal, page, records in scheduler.iter_scrape(["slow", "fast"]):
+        seen.append((portal, page))
+        if sum(p == "fast" for p, _ in seen) == 25:
+            scheduler.fast_read.set()
+    # Ranges of one portal may finish in any order; pages within a range come in order
+    assert sorted(seen[:25]) == [("fast", page) for page in range(1, 26)]
+    assert sorted(seen[25:]) == [("slow", page) for page in range(1, 26)]
+
+def test_scrape_keeps_page_order_and_what_a_failed_portal_read():
+    scheduler = FakeScheduler(fail={("slow", 11)})
+    scheduler.fast_read.set()
+    results = scheduler.scrape(["slow", "fast"])
+    assert [r.invoice_id for r in results["fast"]] == [f"fast-{page}" for page in range(1, 26)]
+    assert [r.invoice_id for r in results["slow"]] == [f"slow-{page}" for page in (*range(1, 11), *range(21, 26))]
@@ -0,0 +1,70 @@
+import sqlite3
+from manifest import RunManifest
+
+FIELDS = ("10021", "Feb 13, 2019", "Acme LLC", "$1,234.40")
+
+def downloaded(manifest, invoice_id, content=None):
+    path = f"{invoice_id}.png"
+    with open(path, "wb") as f:
+        f.write((content or invoice_id).encode())
+    manifest.mark_listed(invoice_id, "01-02-2019", f"http://portal/{invoice_id}")
+    return manifest.mark_downloaded(invoice_id, path)
+
+def test_a_rerun_resumes_where_the_last_one_stopped():
+    manifest = RunManifest("manifest.sqlite")
+    manifest.mark_listed("inv0", "01-02-2019", "http://portal/inv0")
+    for i in (1, 2, 3):
+        downloaded(manifest, f"inv{i}")
+    manifest.mark_ocrd("inv2", FIELDS)
+    manifest.mark_ocrd("inv3", FIELDS)
+    manifest.mark_emitted(["inv3"])
+    manifest.close()
+
+    # The crash: reopened, each invoice picks up at its next step
+    manifest = RunManifest("manifest.sqlite")
+    assert not manifest.is_downloaded("inv0")
+    assert manifest.is_downloaded("inv1")
+    assert manifest.pending_ocr() == [("inv1", "inv1.png")]
+    assert manifest.pending_emit() == [("inv2", "01-02-2019", FIELDS, None)]
+    assert manifest.emitted_fields() == [FIELDS]
+    assert manifest.counts() == {"listed": 1, "downloaded": 1, "ocrd": 1, "emitted": 1, "failed": 0}
+
+def test_failed_ocr_is_retried():
+    manifest = RunManifest("manifest.sqlite")
+    downloaded(manifest, "inv1")
+    manifest.mark_ocrd("inv1", None)
+    assert manifest.status("inv1")["state"] == "failed"
+    assert manifest.pending_emit() == []
+    assert manifest.pending_ocr() == [("inv1", "inv1.png")]
+    # The same bytes dropped in again are read again too, unlike an invoice already read
+    assert manifest.mark_downloaded("inv1", "inv1.png")
+
+    manifest.mark_ocrd("inv1", FIELDS)
+    assert manifest.pending_ocr() == []
+    assert manifest.pending_emit() == [("inv1", "01-02-2019", FIELDS, None)]
+
+def test_only_new_bytes_are_read_again():
+    manifest = RunManifest("manifest.sqlite")
+    downloaded(manifest, "inv1")
+    manifest.mark_ocrd("inv1", FIELDS)
+    manifest.mark_emitted(["inv1"])
+    assert not downloaded(manifest, "inv1")
+    assert manifest.status("inv1")["state"] == "emitted"
+
+    assert downloaded(manifest, "inv1", content="reissued")
+    assert manifest.status("inv1")["state"] == "downloaded"
+    assert manifest.status("inv1")["fields"] is None
+
+def test_failures_in_older_manifests_are_retried():
+    # Kept as OCR'd with no fields before failures had their own state
+    manifest = RunManifest("manifest.sqlite")
+    downloaded(manifest, "inv1")
+    manifest.close()
+    conn = sqlite3.connect("manifest.sqlite")
+    conn.execute("UPDATE invoices SET state = 'ocrd', fields = NULL")
+    conn.commit()
+    conn.close()
+
+    manifest = RunManifest("manifest.sqlite")
+    assert manifest.status("inv1")["state"] == "failed"
+    assert manifest.pending_ocr() == [("inv1", "inv1.png")]
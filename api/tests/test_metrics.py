@@ -0,0 +1,10 @@
+import os
+import stat
+from metrics import RunMetrics, NEW_FILE_MODE
+
+def test_prometheus_file_is_readable_by_the_collector():
+    metrics = RunMetrics()
+    metrics.record("inv1", "ocr", 0.5)
+    metrics.finish()
+    assert stat.S_IMODE(os.stat(metrics.prometheus_path).st_mode) == 0o644 & NEW_FILE_MODE
+    assert 'invoice_pipeline_stage_seconds_count{stage="ocr"} 1' in open(metrics.prometheus_path).read()
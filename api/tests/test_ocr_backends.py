@@ -0,0 +1,21 @@
+import subprocess
+import ocr_backends
+from ocr_backends import engine_version
+
+def test_engine_version_does_not_start_an_engine(monkeypatch):
+    calls = []
+
+    def fake_run(args, **kwargs):
+        calls.append(args)
+        return subprocess.CompletedProcess(args, 0, stdout="tesseract 5.3.0\n leptonica-1.82.0\n", stderr="")
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    monkeypatch.setattr(ocr_backends, "_backends", {})
+    engine_version.cache_clear()
+    try:
+        assert engine_version("pytesseract") == "pytesseract-5.3.0"
+        assert engine_version("pytesseract") == "pytesseract-5.3.0"
+    finally:
+        engine_version.cache_clear()
+    assert len(calls) == 1  # Asked once per process
+    assert ocr_backends._backends == {}
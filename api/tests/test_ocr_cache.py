@@ -0,0 +1,31 @@
+import itertools
+from types import SimpleNamespace
+import ocr_cache
+from ocr_cache import OcrCache
+
+def test_least_recently_used_entries_are_evicted(monkeypatch):
+    # A clock that always moves on, so every access has its own place in the LRU order
+    clock = itertools.count(1)
+    monkeypatch.setattr(ocr_cache, "time", SimpleNamespace(time=lambda: next(clock)))
+    cache = OcrCache("cache.sqlite", max_bytes=30)
+    for key in "abc":
+        cache.put(key, "x" * 10, None)
+    assert cache.get("a") == ("x" * 10, None)  # Now b is the least recently used
+
+    cache.put("d", "y" * 5, ("1",))  # 10 bytes with its fields: over the cap
+    assert cache.get("b") is None
+    assert cache.get("c") == ("x" * 10, None)
+    assert cache.get("d") == ("y" * 5, ("1",))
+    assert cache.stats() == {"hits": 3, "misses": 1, "evictions": 1, "entries": 3, "bytes": 30}
+
+def test_counters_are_shared_and_kept():
+    # Every worker process opens its own handle on the same file
+    first = OcrCache("cache.sqlite")
+    first.put("a", "text", None)
+    first.get("a")
+    second = OcrCache("cache.sqlite")
+    second.get("a")
+    second.get("b")
+    first.close()
+    second.close()
+    assert OcrCache("cache.sqlite").stats() == {"hits": 2, "misses": 1, "evictions": 0, "entries": 1, "bytes": 4}
@@ -0,0 +1,31 @@
+import os
+from ocr_pool import iter_extract, new_pool, start_workers
+
+def crash_on_bad(path):
+    # Stands in for a decoder that segfaults on one image: the worker process dies outright
+    if "bad" in path:
+        os._exit(1)
+    return path.upper()
+
+def test_a_crashing_image_only_costs_its_own_row(caplog):
+    paths = [f"inv{i:02d}.png" for i in range(40)]
+    paths[5] = "bad05.png"
+    with caplog.at_level("INFO"):
+        results = list(iter_extract(paths, crash_on_bad, workers=4, chunk_size=2))
+    assert results == [None if "bad" in path else path.upper() for path in paths]
+    assert "OCR'd 39 invoices" in caplog.text and "1 failed" in caplog.text
+
+def note_warm_up():
+    with open(f"warm-{os.getpid()}", "x"):
+        pass
+
+def test_every_worker_warms_up_once():
+    pool = new_pool(3, note_warm_up)
+    try:
+        start_workers(pool, 3)
+        pids = {future.result() for future in [pool.submit(os.getpid) for _ in range(30)]}
+    finally:
+        pool.shutdown()
+    warmed = {int(name.split("-")[1]) for name in os.listdir() if name.startswith("warm-")}
+    assert len(warmed) == 3
+    assert pids <= warmed
@@ -0,0 +1,55 @@
+import os
+import time
+import threading
+import pipeline
+from pipeline import InvoicePipeline
+from manifest import RunManifest
+from listing import InvoiceRecord
+
+def test_failed_ocr_stage_stops_the_run(tmp_path, monkeypatch):
+    def broken_pool(*args, **kwargs):
+        raise OSError("cannot start OCR workers")
+
+    def download(invoice_id, url):
+        path = tmp_path / f"{invoice_id}.png"
+        path.write_bytes(invoice_id.encode())
+        return str(path)
+
+    monkeypatch.setattr(pipeline, "new_pool", broken_pool)
+    records = [InvoiceRecord(f"inv{i}", "01-01-2020", f"http://portal/{i}") for i in range(50)]
+    run = InvoicePipeline(str(tmp_path), "out.csv", RunManifest("manifest.sqlite"), records=records,
+                          queue_size=1, download_workers=2)
+    monkeypatch.setattr(run.downloader, "download", download)
+
+    # More invoices than the queues hold: without the abort, the download threads block on a full queue
+    runner = threading.Thread(target=run.run, daemon=True)
+    runner.start()
+    runner.join(10)
+    assert not runner.is_alive()
+    assert run.aborted.is_set()
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith(("list", "download-"))]
+
+def fake_extract(path):
+    # A decoder segfault on the one bad image; the rest read cleanly
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name == "inv3":
+        os._exit(1)
+    return (name.upper(), "Jan 01, 2020", "Acme LLC", "$1.00"), {"started": time.time()}
+
+def test_a_crashing_invoice_fails_alone(tmp_path, monkeypatch):
+    def download(invoice_id, url):
+        path = tmp_path / f"{invoice_id}.png"
+        path.write_bytes(invoice_id.encode())
+        return str(path)
+
+    monkeypatch.setattr(pipeline, "extract_invoice_timed", fake_extract)
+    records = [InvoiceRecord(f"inv{i}", "01-01-2020", f"http://portal/{i}") for i in range(12)]
+    manifest = RunManifest("manifest.sqlite")
+    run = InvoicePipeline(str(tmp_path), "out.csv", manifest, records=records, ocr_workers=2)
+    monkeypatch.setattr(run.downloader, "download", download)
+
+    assert run.run() == 11
+    assert not run.aborted.is_set()
+    assert manifest.status("inv3")["state"] == "failed"
+    assert manifest.status("inv3")["fields"] is None
+    assert manifest.status("inv4")["fields"] is not None
@@ -0,0 +1,82 @@
+import csv
+from datetime import date
+import pytest
+from postprocess import RowValidator
+
+TODAY = date(2024, 1, 1)
+# Vectorized (pandas) and row-by-row paths must agree on every rule
+PATHS = {"rows": float("inf"), "pandas": 0}
+
+def record(invoice_id, invoice_no="X1", invoice_date="Mar 3, 2021", total="$10.00", duplicate_of=None, due=None):
+    return (invoice_id, due, (invoice_no, invoice_date, "Acme Corp.", total), duplicate_of)
+
+def validator(tmp_path, path, **kwargs):
+    return RowValidator(str(tmp_path / "out_rejects.csv"), today=TODAY, vectorize_min_rows=PATHS[path], **kwargs)
+
+def rejects(tmp_path):
+    with open(tmp_path / "out_rejects.csv", newline="") as f:
+        return {row["ID"]: row["Reasons"] for row in csv.DictReader(f)}
+
+@pytest.mark.parametrize("path", PATHS)
+def test_rows_are_normalized(tmp_path, path):
+    rows = validator(tmp_path, path, due_dates={"a": "01-02-2021"}, default_due_date="25-02-2019").process([
+        record("a", total="$17,468.03"),
+        record("b", invoice_no=" X2 ", total="$1,234.4", due="05-05-2021"),
+        record("c", invoice_no="X3"),
+        record("d", invoice_no="X4", total="$1.015"),  # As a float, 1.01499...
+    ])
+    assert rows == [
+        ["a", "01-02-2021", "X1", "03-03-2021", "Acme Corp.", "17468.03", ""],
+        ["b", "05-05-2021", "X2", "03-03-2021", "Acme Corp.", "1234.40", ""],
+        ["c", "25-02-2019", "X3", "03-03-2021", "Acme Corp.", "10.00", ""],
+        ["d", "25-02-2019", "X4", "03-03-2021", "Acme Corp.", "1.02", ""],
+    ]
+
+@pytest.mark.parametrize("path", PATHS)
+def test_every_failed_rule_is_listed(tmp_path, path):
+    rows = validator(tmp_path, path).process([
+        record("a", invoice_no="", invoice_date="Marc 3 2021", total="abc"),
+        record("b", invoice_no="X2", invoice_date="Mar 3, 2025", total="$0.00"),
+        record("c", invoice_no="X3", total="$2,000,000.00"),
+    ])
+    assert rows == []
+    assert rejects(tmp_path) == {
+        "a": "missing_invoice_no;bad_invoice_date;bad_amount",
+        "b": "future_invoice_date;amount_out_of_range",
+        "c": "amount_out_of_range",
+    }
+
+@pytest.mark.parametrize("path", PATHS)
+def test_rejected_row_does_not_claim_its_invoice_number(tmp_path, path):
+    # A row rejected for its amount must not make a later, valid row with the same number a duplicate
+    rows = validator(tmp_path, path).process([record("a", total="$-5.00"), record("b")])
+    assert [row[0] for row in rows] == ["b"]
+    assert rejects(tmp_path) == {"a": "amount_out_of_range"}
+
+@pytest.mark.parametrize("path", PATHS)
+def test_duplicate_invoice_numbers(tmp_path, path):
+    rows_validator = validator(tmp_path, path)
+    rows_validator.claim([("OLD", "Jan 1, 2020", "Acme Corp.", "$1.00")])
+    rows = rows_validator.process([
+        record("a"),
+        record("b"),  # Same number as a
+        record("c", duplicate_of="a"),  # Known copy: flagged, not rejected
+        record("d", invoice_no="OLD"),  # Written on an earlier run
+    ])
+    assert [row[0] for row in rows] == ["a", "c"]
+    assert rejects(tmp_path) == {"b": "duplicate_invoice_no", "d": "duplicate_invoice_no"}
+
+    # ...and across batches
+    assert rows_validator.process([record("e")]) == []
+    assert rows_validator.reasons["e"] == "duplicate_invoice_no"
+
+def test_paths_agree(tmp_path):
+    records = [record(f"r{i}", invoice_no=f"N{i % 7}", invoice_date=["Mar 3, 2021", "Feb 30, 2021", "May 1, 2030"][i % 3],
+                      total=["$5.00", "$0.00", "$1,000.5", "x"][i % 4], duplicate_of="r0" if i % 5 == 0 else None)
+               for i in range(60)]
+    results = {}
+    for path in PATHS:
+        (tmp_path / path).mkdir()
+        rows = validator(tmp_path / path, path).process(records)
+        results[path] = (rows, rejects(tmp_path / path))
+    assert results["rows"] == results["pandas"]
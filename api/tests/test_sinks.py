@@ -0,0 +1,50 @@
+import csv
+import pytest
+import pandas as pd
+from sinks import CsvSink, CSV_HEADER
+
+OLD_HEADER = CSV_HEADER[:6]  # Before DuplicateOf
+
+def test_old_csv_is_migrated_before_appending(tmp_path):
+    path = tmp_path / "out.csv"
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows([OLD_HEADER, ["a", "25-02-2019", "X1", "03-03-2021", "Acme Corp.", "10.00"]])
+
+    sink = CsvSink(str(path))
+    sink.write_rows([["b", "25-02-2019", "X2", "03-03-2021", "Acme Corp.", "20.00", "a"]])
+    sink.close()
+
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    assert list(df.columns) == CSV_HEADER
+    assert df["DuplicateOf"].tolist() == ["", "a"]
+
+def test_unrelated_csv_is_not_appended_to(tmp_path):
+    path = tmp_path / "out.csv"
+    path.write_text("Name,Amount\nx,1\n")
+    with pytest.raises(RuntimeError):
+        CsvSink(str(path))
+    assert path.read_text() == "Name,Amount\nx,1\n"
+
+def test_parquet_rewrite_replaces_earlier_parts(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    from sinks import ParquetSink
+    path = str(tmp_path / "out.parquet")
+    row = ["a", "25-02-2019", "X1", "03-03-2021", "Acme Corp.", "10.00", ""]
+    for pid in (1, 2):
+        # Part files are named by time and pid; keep two runs in the same second apart
+        monkeypatch.setattr("os.getpid", lambda: pid)
+        sink = ParquetSink(path, append=False)
+        sink.write_rows([row])
+        sink.close()
+    assert pd.read_parquet(path)["ID"].tolist() == ["a"]
+
+def test_parquet_batches_are_readable_before_close(tmp_path):
+    pytest.importorskip("pyarrow")
+    from sinks import ParquetSink
+    path = str(tmp_path / "out.parquet")
+    sink = ParquetSink(path)
+    sink.write_rows([["a", "25-02-2019", "X1", "03-03-2021", "Acme Corp.", "10.00", ""]])
+    sink.write_rows([["b", "25-02-2019", "X2", "03-03-2021", "Acme Corp.", "20.00", ""]])
+    # As if the run were killed here: every flushed batch is already a complete file
+    assert pd.read_parquet(path)["ID"].tolist() == ["a", "b"]
+    sink.close()
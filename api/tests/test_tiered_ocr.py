@@ -0,0 +1,74 @@
+import pytest
+import extract
+from ocr_backends import OcrWord
+from tiered_ocr import QUALITY_LINE_CONFIG, QUALITY_REGION_CONFIG
+
+def line(number, *words, confidence=95.0):
+    top = 20 + 30 * number
+    return [OcrWord(text, confidence, (1, 1, number), (10 + 40 * i, top, 45 + 40 * i, top + 20))
+            for i, text in enumerate(words)]
+
+COMPANY = line(0, "Acme", "LLC", "$1,234.40")
+NUMBER = line(1, "Invoice", "#10021")
+DATE = line(2, "Date:", "Feb", "13,", "2019")
+
+class StubEngine:
+    """Hands back fixed words per config, as tesseract's TSV would have them."""
+
+    def __init__(self, reads):
+        self.reads = reads
+        self.configs = []
+
+    def image_to_data(self, image, config=None):
+        self.configs.append(config)
+        return self.reads[config]
+
+@pytest.fixture
+def read(tmp_path, monkeypatch):
+    from PIL import Image
+    path = tmp_path / "inv.png"
+    Image.new("L", (300, 300), 255).save(path)  # Square: matches no layout, so read as one region
+
+    def read(reads):
+        engine = StubEngine(reads)
+        monkeypatch.setattr(extract, "ocr_engine", lambda: engine)
+        fields, _, _ = extract.read_invoice(str(path), lambda step, fn, *args: fn(*args))
+        return {field: (r.value, r.tier) for field, r in fields.items()}, engine.configs
+    return read
+
+def test_clean_read_stays_on_the_fast_tier(read):
+    fields, configs = read({None: COMPANY + NUMBER + DATE})
+    assert configs == [None]
+    assert fields == {"company_name": ("Acme LLC", "fast"), "total_due": ("$1,234.40", "fast"),
+                      "invoice_number": ("10021", "fast"), "invoice_date": ("Feb 13, 2019", "fast")}
+
+def test_doubtful_line_is_read_again_as_one_line(read):
+    misread = line(1, "Invoice", "#1OO21", confidence=41.0)
+    fields, configs = read({None: COMPANY + misread + DATE, QUALITY_LINE_CONFIG: line(0, "Invoice", "#10021")})
+    # The same engine, switched to single-line mode for the re-read
+    assert configs == [None, QUALITY_LINE_CONFIG]
+    assert fields["invoice_number"] == ("10021", "quality")
+    assert fields["invoice_date"] == ("Feb 13, 2019", "fast")
+
+def test_missing_field_rereads_the_region(read):
+    fields, configs = read({None: COMPANY + NUMBER, QUALITY_REGION_CONFIG: COMPANY + NUMBER + DATE})
+    assert configs == [None, QUALITY_REGION_CONFIG]
+    assert fields["invoice_date"] == ("Feb 13, 2019", "quality")
+    assert fields["invoice_number"] == ("10021", "fast")
+
+def test_cache_hit_returns_what_the_miss_did(tmp_path, monkeypatch):
+    from PIL import Image
+    path = tmp_path / "inv.png"
+    Image.new("L", (300, 300), 255).save(path)
+    # The re-read is less sure than the first read, so the merged fields keep "1OO21" while the final
+    # text holds the re-read line
+    engine = StubEngine({None: COMPANY + line(1, "Invoice", "#1OO21", confidence=41.0) + DATE,
+                         QUALITY_LINE_CONFIG: line(0, "Invoice", "#10021", confidence=30.0)})
+    monkeypatch.setattr(extract, "ocr_engine", lambda: engine)
+    monkeypatch.setattr(extract, "tesseract_version", lambda: "stub-1.0")
+
+    miss, miss_timings = extract.extract_invoice_timed(str(path))
+    hit, hit_timings = extract.extract_invoice_timed(str(path))
+    assert (miss_timings["cache"], hit_timings["cache"]) == ("miss", "hit")
+    assert miss[0] == "1OO21"
+    assert hit == miss
@@ -0,0 +1,146 @@
+from itertools import groupby
+from collections import namedtuple
+from field_extractor import extract_fields, FIELDS
+
+# === CONFIG ===
+USE_TIERS = True  # Re-read missing or doubtful fields with the slower settings below; False keeps the first read
+MIN_CONFIDENCE = 80  # Tesseract word confidence (0-100) below which a field's line is read again
+QUALITY_SCALE = 2  # Upscale factor for re-read regions; small text is where tesseract loses characters
+LINE_PADDING = 6  # Pixels kept around a re-read line's box
+QUALITY_LINE_CONFIG = "--psm 7"  # A re-read line is exactly one line of text
+QUALITY_REGION_CONFIG = "--psm 4"  # A region with a missing field: one column of lines of varying size
+TIERS = ("fast", "quality")
+
+# One line of OCR output: which page and region image it came from, its box there, its (text, confidence)
+# words and the tier that read it
+Line = namedtuple("Line", ["page", "image", "box", "words", "tier"])
+
+# One field as read: its value, the lowest OCR confidence among its words, the tier that read them and
+# the indexes of the lines they sit on
+FieldRead = namedtuple("FieldRead", ["value", "confidence", "tier", "lines"])
+
+def config_key():
+    # Everything here that changes the extracted text; part of the OCR cache key
+    if not USE_TIERS:
+        return "tiers=off"
+    return f"tiers={MIN_CONFIDENCE},{QUALITY_SCALE},{LINE_PADDING},{QUALITY_LINE_CONFIG},{QUALITY_REGION_CONFIG}"
+
+def region(page, image, words, tier=TIERS[0]):
+    # One OCR'd image (a page, or a field region cropped from it) as an OcrLayout region
+    return (page, image), to_lines(words, page, image, tier)
+
+def to_lines(words, page, image, tier):
+    lines = []
+    for _, line_words in groupby(words, key=lambda word: word.line):
+        line_words = list(line_words)
+        box = (min(w.box[0] for w in line_words), min(w.box[1] for w in line_words),
+               max(w.box[2] for w in line_words), max(w.box[3] for w in line_words))
+        lines.append(Line(page, image, box, [(w.text, w.confidence) for w in line_words], tier))
+    return lines
+
+# === LAYOUT ===
+class OcrLayout:
+    """OCR text that remembers, for every word, its confidence and the line (and region) it was read from.
+
+    `regions` is the list of ((page, image index), [Line, ...]) in reading order, one entry per image
+    sent to OCR, so a region or a single line can be swapped for a better read and the text rebuilt.
+    """
+
+    def __init__(self, regions=()):
+        self.regions = list(regions)
+        self.lines = [line for _, lines in self.regions for line in lines]
+        self.text = "\n".join(" ".join(text for text, _ in line.words) for line in self.lines)
+        self.spans = []  # (start, end, confidence, line index) per word, in text order
+        offset = 0
+        for line_index, line in enumerate(self.lines):
+            for text, confidence in line.words:
+                self.spans.append((offset, offset + len(text), confidence, line_index))
+                offset += len(text) + 1
+
+    def words_in(self, span):
+        start, end = span
+        return [(confidence, line_index) for w_start, w_end, confidence, line_index in self.spans
+                if w_start < end and w_end > start]
+
+    def replace(self, regions, lines):
+        # regions: (page, image) -> new [Line]; lines: line index -> new Line
+        rebuilt, line_index = [], 0
+        for key, old_lines in self.regions:
+            new_lines = regions.get(key)
+            if new_lines is None:
+                new_lines = [lines.get(line_index + i, line) for i, line in enumerate(old_lines)]
+            line_index += len(old_lines)
+            rebuilt.append((key, new_lines))
+        return OcrLayout(rebuilt)
+
+# === FIELDS ===
+def read_fields(layout):
+    """Return {field: FieldRead}; values a template pins outright (no span) count as fully confident."""
+    fields = {}
+    for field, match in extract_fields(layout.text).items():
+        if match.span is None:
+            fields[field] = FieldRead(match.value, 100.0, TIERS[0], frozenset())
+            continue
+        words = layout.words_in(match.span)
+        lines = frozenset(line_index for _, line_index in words)
+        tiers = {layout.lines[line_index].tier for line_index in lines}
+        fields[field] = FieldRead(match.value, min((confidence for confidence, _ in words), default=0.0),
+                                  TIERS[1] if TIERS[1] in tiers else TIERS[0], lines)
+    return fields
+
+def weak_spots(fields, min_confidence=MIN_CONFIDENCE):
+    # (lines holding a doubtful field, whether any field is missing outright)
+    lines = set()
+    for read in fields.values():
+        if read.confidence < min_confidence:
+            lines.update(read.lines)
+    return lines, any(field not in fields for field in FIELDS)
+
+def merge_fields(first, second):
+    # Per field, whichever read tesseract was surer of; on a tie the first (cheaper) read stays
+    merged = dict(first)
+    for field, read in second.items():
+        if field not in merged or read.confidence > merged[field].confidence:
+            merged[field] = read
+    return merged
+
+# === SECOND TIER ===
+def _upscale(image, factor=QUALITY_SCALE):
+    from PIL import Image
+    if factor <= 1:
+        return image
+    return image.resize((image.width * factor, image.height * factor), Image.BICUBIC)
+
+def reread(layout, engine, page_images, line_indexes, whole_regions):
+    """Re-OCR some lines (or whole regions) of `layout` with the quality settings; returns the new layout.
+
+    `engine` is the one the first read used: the quality settings are passed per image rather than
+    loading another engine for them. page_images(pages) yields (page number, [region images]) for the
+    pages asked for, decoded again the same way as for the first read, so the line boxes still apply.
+    """
+    wanted_regions = {key for key, _ in layout.regions} if whole_regions else set()
+    by_region = {}
+    for line_index in line_indexes:
+        line = layout.lines[line_index]
+        if (line.page, line.image) not in wanted_regions:
+            by_region.setdefault((line.page, line.image), []).append(line_index)
+
+    new_regions, new_lines = {}, {}
+    pages = {page for page, _ in wanted_regions | set(by_region)}
+    for page, images in page_images(pages):
+        for image_index, image in enumerate(images):
+            key = (page, image_index)
+            if key in wanted_regions:
+                words = engine.image_to_data(_upscale(image), QUALITY_REGION_CONFIG)
+                new_regions[key] = to_lines(words, page, image_index, TIERS[1])
+            for line_index in by_region.get(key, []):
+                left, top, right, bottom = layout.lines[line_index].box
+                crop = image.crop((max(0, left - LINE_PADDING), max(0, top - LINE_PADDING),
+                                   min(image.width, right + LINE_PADDING), min(image.height, bottom + LINE_PADDING)))
+                words = engine.image_to_data(_upscale(crop), QUALITY_LINE_CONFIG)
+                if words:
+                    # However tesseract split it, this is still one line of the page
+                    box = layout.lines[line_index].box
+                    new_lines[line_index] = Line(page, image_index, box, [(w.text, w.confidence) for w in words],
+                                                 TIERS[1])
+    return layout.replace(new_regions, new_lines)